@@ -0,0 +1,170 @@
+"""Generate devcontainer.json files for many repositories, e.g. to pre-warm the database.
+
+Reads GitHub URLs (one per line, # comments allowed) from a file or stdin and
+runs them through the same pipeline as /generate with a bounded number of
+concurrent repositories. Embeddings and inserts go through the persistence
+queue in large batches. Progress is appended to a checkpoint file, so an
+interrupted run picks up where it stopped when started again.
+
+    python batch_generate.py repos.txt --concurrency 8
+    cat repos.txt | python batch_generate.py - --checkpoint data/batch.jsonl
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+# Before the helpers read their settings at import time
+load_dotenv()
+
+from helpers.github_client import close_client, wait_for_rate_limit
+from helpers.github_helpers import is_valid_github_url, normalize_repo_url
+import main as app
+
+
+def read_urls(source):
+    stream = sys.stdin if source == "-" else open(source)
+    try:
+        urls, seen = [], set()
+        for line in stream:
+            url = line.split("#", 1)[0].strip().rstrip("/")
+            if not url:
+                continue
+            if not is_valid_github_url(url):
+                logging.warning(f"Skipping invalid GitHub URL: {url}")
+                continue
+            if normalize_repo_url(url) not in seen:
+                seen.add(normalize_repo_url(url))
+                urls.append(url)
+        return urls
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def read_checkpoint(path):
+    """Return {normalized url: status} for repositories already processed."""
+    done = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a line cut short by an interruption
+                done[normalize_repo_url(entry["url"])] = entry["status"]
+    return done
+
+
+async def run_batch(urls, args):
+    checkpoint = open(args.checkpoint, "a")
+    pending = asyncio.Queue()
+    for url in urls:
+        pending.put_nowait(url)
+    counts = {"ok": 0, "failed": 0}
+    start = time.perf_counter()
+    # Generated repositories are checkpointed once their row is saved; one
+    # whose row the persistence queue dropped is left out, so the next run
+    # generates it again.
+    unsaved = {}
+
+    def write_checkpoint(entry):
+        checkpoint.write(json.dumps(entry) + "\n")
+        checkpoint.flush()
+
+    def on_persisted(rows, saved):
+        for row in rows:
+            entry = unsaved.pop(normalize_repo_url(row["url"]), None)
+            if entry is None:
+                continue
+            if saved:
+                write_checkpoint(entry)
+            else:
+                counts["ok"] -= 1
+                counts["failed"] += 1
+
+    app.persistence_queue.on_persisted = on_persisted
+
+    async def worker():
+        while True:
+            try:
+                url = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await wait_for_rate_limit(args.rate_limit_reserve)
+            entry = {"url": url}
+            try:
+                _, source = await app.generate_once(url, args.regenerate)
+                entry.update(status="ok", source=source)
+            except Exception as e:
+                logging.error(f"Failed to generate devcontainer.json for {url}: {e}")
+                entry.update(status="failed", error=str(e))
+            counts[entry["status"]] += 1
+            if entry.get("source") not in (None, "database"):
+                # Anything not served from the database was queued for insert
+                unsaved[normalize_repo_url(url)] = entry
+            else:
+                write_checkpoint(entry)
+
+            finished = counts["ok"] + counts["failed"]
+            if finished % args.progress_every == 0 or finished == len(urls):
+                rate = finished / (time.perf_counter() - start)
+                logging.info(f"{finished}/{len(urls)} repositories ({counts['failed']} failed, {rate:.2f}/s)")
+
+    try:
+        await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+    finally:
+        # Rows still in the persistence queue are saved before exiting, even
+        # when the run is interrupted.
+        await app.persistence_queue.drain()
+        app.persistence_queue.on_persisted = None
+        checkpoint.close()
+        await close_client()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="file with one GitHub URL per line, or - for stdin")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("BATCH_CONCURRENCY", 4)))
+    parser.add_argument("--checkpoint", help="progress file (default: <source>.checkpoint.jsonl)")
+    parser.add_argument("--regenerate", action="store_true", help="regenerate repositories already in the database")
+    parser.add_argument("--retry-failed", action="store_true", help="retry repositories that failed in a previous run")
+    parser.add_argument("--batch-size", type=int, default=64, help="rows per embedding request and insert")
+    parser.add_argument("--rate-limit-reserve", type=int, default=200,
+                        help="pause until the GitHub rate limit resets when fewer requests than this remain")
+    parser.add_argument("--progress-every", type=int, default=25)
+    args = parser.parse_args()
+    args.checkpoint = args.checkpoint or (
+        "batch.checkpoint.jsonl" if args.source == "-" else f"{args.source}.checkpoint.jsonl"
+    )
+
+    logging.getLogger().setLevel(logging.INFO)
+    if not app.check_env_vars():
+        sys.exit(1)
+
+    urls = read_urls(args.source)
+    done = read_checkpoint(args.checkpoint)
+    skip = {"ok", "failed"} if not args.retry_failed else {"ok"}
+    todo = [url for url in urls if done.get(normalize_repo_url(url)) not in skip]
+    logging.info(f"{len(urls)} repositories, {len(urls) - len(todo)} already processed, {len(todo)} to go")
+    if not todo:
+        return
+
+    app.persistence_queue.batch_size = args.batch_size
+    app.persistence_queue.flush_interval = max(app.persistence_queue.flush_interval, 2.0)
+    try:
+        counts = asyncio.run(run_batch(todo, args))
+    except KeyboardInterrupt:
+        logging.warning(f"Interrupted; run again to resume from {args.checkpoint}")
+        sys.exit(130)
+    logging.info(f"Done: {counts['ok']} generated or found, {counts['failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,482 @@
+"""Offline end-to-end benchmark of the generation pipeline.
+
+Runs fetch_repo_context, truncate_context, generate_devcontainer_json and the
+/generate route for a corpus of repositories, and records wall time, CPU time,
+peak Python memory, HTTP calls and tokens for each stage. Nothing touches the
+network: GitHub responses are replayed from fixtures, chat completions and
+embeddings are answered by a stub, and records go to a throwaway SQLite
+database. The /generate stage is a regenerate of a repository its warm-up
+run stored, so the timed runs cover the HEAD lookup, stored-context reuse,
+generation and the queued insert. Results are written as JSON; pass
+--baseline to fail on regressions.
+
+The corpus is three synthetic repositories (small, medium, large) plus any
+fixture recorded into benchmarks/fixtures/ with --record (needs GITHUB_TOKEN).
+
+    python -m benchmarks.end_to_end
+    python -m benchmarks.end_to_end --baseline benchmarks/results/end_to_end.json --output new.json
+    python -m benchmarks.end_to_end --record https://github.com/pallets/flask
+"""
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timezone
+
+import httpx
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), "results", "end_to_end.json")
+
+# (directories, files per directory, lines in each manifest)
+SYNTHETIC_REPOS = {"small": (3, 5, 20), "medium": (20, 25, 400), "large": (120, 80, 6000)}
+
+STUB_DEVCONTAINER = {
+    "name": "Offline benchmark",
+    "image": "mcr.microsoft.com/devcontainers/python:3.12-bookworm",
+    "forwardPorts": [8000],
+    "postCreateCommand": "pip install -r requirements.txt",
+}
+EMBEDDING_DIMENSIONS = 1536
+
+# Deterministic metrics must not grow at all; timings and memory may move by
+# the --tolerance fraction before they count as a regression.
+EXACT_METRICS = ["github_calls", "llm_calls", "embedding_calls", "tokenizer_tokens", "prompt_tokens", "completion_tokens"]
+TIMED_METRICS = ["wall_ms", "cpu_ms", "peak_kb"]
+
+# Response headers kept in recorded fixtures
+KEPT_HEADERS = {"content-type", "etag", "last-modified"}
+
+
+def request_key(request):
+    return f"{request.method} {request.url}"
+
+
+def response_entry(status, body, content_type="application/json; charset=utf-8"):
+    if not isinstance(body, str):
+        body = json.dumps(body)
+    return {"status": status, "headers": {"content-type": content_type}, "body": body}
+
+
+def synthetic_fixture(name, dirs, files_per_dir, lines):
+    """Responses for a generated repository, in the same format --record saves."""
+    owner, repo = "offline-bench", name
+    sha = hashlib.sha1(name.encode()).hexdigest()
+    api = f"https://api.github.com/repos/{owner}/{repo}"
+    raw = f"https://raw.githubusercontent.com/{owner}/{repo}/{sha}"
+
+    files = {
+        "README.md": f"# {name}\n\n" + "\n\n".join(
+            f"## Section {i}\n\nParagraph {i} explains how to configure and run part {i} of the project."
+            for i in range(lines // 4 + 1)
+        ),
+        "requirements.txt": "\n".join(f"package-{i}==1.{i}.0" for i in range(lines // 10 + 1)),
+        "package.json": json.dumps(
+            {"name": name, "scripts": {"start": "node index.js"},
+             "dependencies": {f"dep-{i}": f"^{i}.0.0" for i in range(lines // 20 + 1)}},
+            indent=2,
+        ),
+        "Dockerfile": "FROM python:3.12-slim\nCOPY . /app\nRUN pip install -r /app/requirements.txt\n",
+        "Cargo.lock": "\n".join(
+            f'[[package]]\nname = "crate-{i}"\nversion = "0.{i}.0"\nchecksum = "{hashlib.sha1(str(i).encode()).hexdigest()}"\n'
+            for i in range(lines // 5 + 1)
+        ),
+    }
+    tree = [{"path": path, "type": "blob"} for path in files]
+    tree.append({"path": "node_modules", "type": "tree"})
+    tree.append({"path": "node_modules/left-pad/package.json", "type": "blob"})
+    for d in range(dirs):
+        tree.append({"path": f"src{d}", "type": "tree"})
+        tree.append({"path": f"src{d}/pkg", "type": "tree"})
+        for f in range(files_per_dir):
+            tree.append({"path": f"src{d}/module{f}.py", "type": "blob"})
+            tree.append({"path": f"src{d}/pkg/helper{f}.py", "type": "blob"})
+
+    responses = {
+        f"GET {api}/commits/HEAD": response_entry(200, sha, "application/vnd.github.sha; charset=utf-8"),
+        f"GET {api}/git/trees/{sha}?recursive=1": response_entry(200, {"sha": sha, "tree": tree, "truncated": False}),
+        f"GET {api}/languages": response_entry(200, {"Python": 1000 * dirs * files_per_dir, "Dockerfile": 120}),
+    }
+    for path, content in files.items():
+        responses[f"GET {raw}/{path}"] = response_entry(200, content, "text/plain; charset=utf-8")
+    return {"repo_url": f"https://github.com/{owner}/{repo}", "responses": responses}
+
+
+def load_corpus():
+    corpus = {name: synthetic_fixture(name, *sizes) for name, sizes in SYNTHETIC_REPOS.items()}
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.json"))):
+        with open(path) as f:
+            corpus[os.path.splitext(os.path.basename(path))[0]] = json.load(f)
+    return corpus
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """Serves GitHub requests from fixtures and stubs the OpenAI endpoints, counting calls."""
+
+    def __init__(self):
+        self.responses = {}
+        self.calls = Counter()
+        self.usage = Counter()
+        self.missing = []
+        self.recent_prompts = []
+
+    async def handle_async_request(self, request):
+        if request.url.path.endswith("/chat/completions"):
+            self.calls["llm_calls"] += 1
+            return self.chat_completion(request)
+        if request.url.path.endswith("/embeddings"):
+            self.calls["embedding_calls"] += 1
+            return self.embeddings(request)
+
+        self.calls["github_calls"] += 1
+        recorded = self.responses.get(request_key(request))
+        if recorded is None:
+            self.missing.append(request_key(request))
+            return httpx.Response(404, json={"message": "Not Found"}, request=request)
+        return httpx.Response(
+            recorded["status"], headers=recorded["headers"], content=recorded["body"].encode(), request=request
+        )
+
+    def chat_completion(self, request):
+        payload = json.loads(request.content)
+        prompt = json.dumps(payload.get("tools")) + "".join(message.get("content") or "" for message in payload["messages"])
+        arguments = json.dumps(STUB_DEVCONTAINER)
+        # Roughly four characters per token, without running the tokenizer
+        # whose work the benchmark measures.
+        usage = {
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": len(arguments) // 4,
+            "prompt_tokens_details": {"cached_tokens": self.cached_tokens(prompt)},
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        self.usage.update(
+            prompt_tokens=usage["prompt_tokens"],
+            cached_prompt_tokens=usage["prompt_tokens_details"]["cached_tokens"],
+            completion_tokens=usage["completion_tokens"],
+        )
+        tool_name = payload["tools"][0]["function"]["name"] if payload.get("tools") else "DevContainerModel"
+        if payload.get("stream"):
+            return self.chat_completion_stream(request, payload, tool_name, arguments)
+        message = {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [{"id": "call_0", "type": "function", "function": {"name": tool_name, "arguments": arguments}}],
+        }
+        return httpx.Response(200, json={
+            "id": "chatcmpl-offline",
+            "object": "chat.completion",
+            "created": 0,
+            "model": payload.get("model") or "stub",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": message}],
+            "usage": usage,
+        }, request=request)
+
+    def cached_tokens(self, prompt):
+        # Like provider prompt caching: the longest prefix shared with a recent
+        # request, in 128-token steps, once it reaches 1024 tokens.
+        shared = max((len(os.path.commonprefix([prompt, recent])) for recent in self.recent_prompts), default=0)
+        self.recent_prompts = [prompt, *self.recent_prompts[:15]]
+        tokens = shared // 4 // 128 * 128
+        return tokens if tokens >= 1024 else 0
+
+    def chat_completion_stream(self, request, payload, tool_name, arguments):
+        # The same tool call as server-sent chunks of a few characters each
+        def chunk(delta, finish_reason=None):
+            return "data: " + json.dumps({
+                "id": "chatcmpl-offline",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": payload.get("model") or "stub",
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }) + "\n\n"
+
+        events = [chunk({"role": "assistant", "tool_calls": [
+            {"index": 0, "id": "call_0", "type": "function", "function": {"name": tool_name, "arguments": ""}}
+        ]})]
+        for start in range(0, len(arguments), 16):
+            events.append(chunk({"tool_calls": [{"index": 0, "function": {"arguments": arguments[start:start + 16]}}]}))
+        events.append(chunk({}, "stop"))
+        events.append("data: [DONE]\n\n")
+        return httpx.Response(
+            200, headers={"content-type": "text/event-stream"}, content="".join(events).encode(), request=request
+        )
+
+    def embeddings(self, request):
+        payload = json.loads(request.content)
+        inputs = payload["input"] if isinstance(payload["input"], list) else [payload["input"]]
+        data = []
+        for i, text in enumerate(inputs):
+            rng = random.Random(hashlib.sha1(str(text).encode()).hexdigest())
+            data.append({"object": "embedding", "index": i, "embedding": [rng.uniform(-1, 1) for _ in range(EMBEDDING_DIMENSIONS)]})
+        tokens = sum(len(str(text)) // 4 for text in inputs)
+        return httpx.Response(200, json={
+            "object": "list", "data": data, "model": payload.get("model") or "stub",
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }, request=request)
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Forwards requests to GitHub and keeps each response for a fixture."""
+
+    def __init__(self):
+        self.inner = httpx.AsyncHTTPTransport()
+        self.responses = {}
+
+    async def handle_async_request(self, request):
+        response = await self.inner.handle_async_request(request)
+        body = await httpx.Response(response.status_code, headers=response.headers, stream=response.stream).aread()
+        headers = {key: value for key, value in response.headers.items() if key in KEPT_HEADERS}
+        self.responses[request_key(request)] = {
+            "status": response.status_code, "headers": headers, "body": body.decode("utf-8", errors="replace"),
+        }
+        return httpx.Response(response.status_code, headers=headers, content=body, request=request)
+
+
+def configure_environment(record=False):
+    database = os.path.join(tempfile.mkdtemp(prefix="devcontainer-bench-"), "devcontainers.db")
+    os.environ.update({
+        "GITHUB_CACHE_ENABLED": "false",
+        "GITHUB_TRAVERSAL": "tree",
+        "STORAGE_BACKEND": "sqlite",
+        "SQLITE_PATH": database,
+        "STREAM_GENERATION": "false",
+        "SEMANTIC_REUSE": "false",
+        "VECTOR_INDEX_PATH": "",
+        "REDIS_URL": "",
+        "MODEL": "gpt-4o",
+        "AZURE_OPENAI_ENDPOINT": "https://offline.openai.azure.com",
+        "AZURE_OPENAI_API_KEY": "offline",
+        "AZURE_OPENAI_API_VERSION": "2024-06-01",
+    })
+    if not record:
+        os.environ["GITHUB_TOKEN"] = "offline"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+def counters(transport):
+    from helpers.token_helpers import encode_stats
+
+    return {**transport.calls, **transport.usage, "tokenizer_tokens": encode_stats["tokens"]}
+
+
+async def measure(transport, stage, repeat, cleanup=None):
+    """Run stage() repeat times for timings, then once more under tracemalloc for peak memory.
+
+    An untimed warm-up run comes first, so every timed run starts from the
+    same state (for /generate: a stored record and context to reuse).
+    """
+    await stage()
+    if cleanup is not None:
+        await cleanup()
+
+    walls, cpus = [], []
+    for _ in range(repeat):
+        before = counters(transport)
+        wall, cpu = time.perf_counter(), time.process_time()
+        result = await stage()
+        walls.append(time.perf_counter() - wall)
+        cpus.append(time.process_time() - cpu)
+        after = counters(transport)
+        if cleanup is not None:
+            await cleanup()
+
+    tracemalloc.start()
+    try:
+        await stage()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    if cleanup is not None:
+        await cleanup()
+
+    metrics = {
+        "wall_ms": round(1000 * statistics.median(walls), 3),
+        "cpu_ms": round(1000 * statistics.median(cpus), 3),
+        "peak_kb": round(peak / 1024, 1),
+    }
+    # Counts from the last timed run; they are the same on every run
+    metrics.update({key: after.get(key, 0) - before.get(key, 0) for key in EXACT_METRICS + ["cached_prompt_tokens"]})
+    return result, metrics
+
+
+async def benchmark_repo(app, transport, fixture, repeat):
+    from helpers.devcontainer_helpers import generate_devcontainer_json, truncate_context
+    from helpers.github_helpers import fetch_repo_context, resolve_head_sha
+
+    transport.responses = fixture["responses"]
+    repo_url = fixture["repo_url"]
+    sha = await resolve_head_sha(repo_url)
+    results = {}
+
+    (repo_context, _, devcontainer_url), results["fetch_repo_context"] = await measure(
+        transport, lambda: fetch_repo_context(repo_url, ref=sha or "HEAD"), repeat
+    )
+
+    async def truncate():
+        return truncate_context(repo_context, max_tokens=126000)
+
+    _, results["truncate_context"] = await measure(transport, truncate, repeat)
+    _, results["generate_devcontainer_json"] = await measure(
+        transport,
+        lambda: generate_devcontainer_json(app.instructor_client, repo_url, repo_context, devcontainer_url, regenerate=True),
+        repeat,
+    )
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app.app), base_url="http://bench") as client:
+        async def generate_route():
+            response = await client.post("/generate", data={"repo_url": repo_url, "regenerate": "true"})
+            if response.status_code != 200 or "Devcontainer.json" not in response.text:
+                raise RuntimeError(f"/generate failed for {repo_url}: {response.status_code} {response.text[-500:]}")
+            return response
+
+        # The insert happens after the response; drain it outside the timings
+        _, results["generate_route"] = await measure(
+            transport, generate_route, repeat, cleanup=app.persistence_queue.drain
+        )
+
+    results["context"] = {"tokens": repo_context.tokens, "sections": len(repo_context.sections)}
+    return results
+
+
+async def run_benchmarks(corpus, repeat):
+    from openai import AsyncAzureOpenAI
+
+    from helpers.github_client import close_client, set_transport
+    from helpers.openai_helpers import setup_instructor
+    import main as app
+
+    transport = ReplayTransport()
+    set_transport(transport)
+    app.openai_client = AsyncAzureOpenAI(
+        api_key="offline",
+        azure_endpoint=os.environ["AZURE_OPENAI_ENDPOINT"],
+        api_version=os.environ["AZURE_OPENAI_API_VERSION"],
+        http_client=httpx.AsyncClient(transport=transport),
+    )
+    app.instructor_client = setup_instructor(app.openai_client)
+
+    repos = {}
+    try:
+        for name, fixture in corpus.items():
+            repos[name] = await benchmark_repo(app, transport, fixture, repeat)
+            print_repo(name, repos[name])
+    finally:
+        await app.persistence_queue.drain()
+        await close_client()
+        set_transport(None)
+    if transport.missing:
+        print(f"warning: {len(transport.missing)} requests had no recorded response, e.g. {transport.missing[0]}")
+    return repos
+
+
+async def record_fixture(repo_url):
+    from helpers.github_client import close_client, set_transport
+    from helpers.github_helpers import fetch_repo_context, resolve_head_sha
+
+    recorder = RecordingTransport()
+    set_transport(recorder)
+    try:
+        sha = await resolve_head_sha(repo_url)
+        await fetch_repo_context(repo_url, ref=sha or "HEAD")
+    finally:
+        await close_client()
+        set_transport(None)
+
+    owner, repo = repo_url.rstrip("/").split("/")[-2:]
+    path = os.path.join(FIXTURES_DIR, f"{owner}__{repo}.json")
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"repo_url": repo_url, "responses": recorder.responses}, f, indent=1)
+    print(f"Recorded {len(recorder.responses)} responses to {path}")
+
+
+def print_repo(name, stages):
+    print(f"{name} ({stages['context']['tokens']} context tokens)")
+    for stage, metrics in stages.items():
+        if stage == "context":
+            continue
+        print(
+            f"  {stage:28} {metrics['wall_ms']:9.1f} ms wall {metrics['cpu_ms']:9.1f} ms CPU "
+            f"{metrics['peak_kb']:9.0f} KB peak  github={metrics['github_calls']} llm={metrics['llm_calls']} "
+            f"tokenizer={metrics['tokenizer_tokens']} prompt={metrics['prompt_tokens']} "
+            f"cached={metrics['cached_prompt_tokens']}"
+        )
+
+
+def compare(results, baseline, tolerance):
+    """Return a description of every metric that got worse than the baseline."""
+    regressions = []
+    for repo, stages in results["repos"].items():
+        for stage, metrics in stages.items():
+            old = baseline.get("repos", {}).get(repo, {}).get(stage)
+            if not old or stage == "context":
+                continue
+            for key in EXACT_METRICS:
+                if metrics[key] > old.get(key, metrics[key]):
+                    regressions.append(f"{repo} {stage} {key}: {old[key]} -> {metrics[key]}")
+            for key in TIMED_METRICS:
+                if key in old and metrics[key] > old[key] * (1 + tolerance) and metrics[key] - old[key] > 1:
+                    regressions.append(f"{repo} {stage} {key}: {old[key]} -> {metrics[key]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage; the median is reported")
+    parser.add_argument("--repos", nargs="*", help="only benchmark these corpus entries")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", help="earlier results file; exit 1 if any metric regressed")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative increase in timings and memory")
+    parser.add_argument("--record", metavar="REPO_URL", help="record the GitHub responses for a repository as a fixture")
+    args = parser.parse_args()
+
+    configure_environment(record=bool(args.record))
+    if args.record:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        asyncio.run(record_fixture(args.record))
+        return
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    corpus = load_corpus()
+    if args.repos:
+        corpus = {name: corpus[name] for name in args.repos}
+    results = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "repos": asyncio.run(run_benchmarks(corpus, args.repeat)),
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Concurrent load test against a running devcontainer-generator server.
+
+Fires bursts of generations at increasing concurrency while probing the home
+page, and reports generation throughput and "/" latency. If the event loop
+were blocked by a generation, "/" latency would track generation time and
+throughput would stay flat as concurrency grows.
+
+Each level runs twice. In the independent run every request is for a
+different repository, so each one is a separate generation. In the
+coalesced run every request is for the same repository, so the server
+merges them into one shared generation. That run shows the
+deduplication, not throughput. The independent run needs at least as
+many repositories as the highest level.
+
+    python main.py &
+    python -m benchmarks.load_test --base-url http://localhost:5001 --levels 1 2 4 8
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+DEFAULT_REPOS = [
+    "https://github.com/devcontainers/cli",
+    "https://github.com/pallets/flask",
+    "https://github.com/expressjs/express",
+    "https://github.com/psf/requests",
+    "https://github.com/fastapi/fastapi",
+    "https://github.com/gin-gonic/gin",
+    "https://github.com/sindresorhus/got",
+    "https://github.com/rust-lang/mdBook",
+]
+
+
+async def generate(client, base_url, repo_url):
+    # Follow the streamed pipeline to its final "done" event
+    start = time.perf_counter()
+    params = {"repo_url": repo_url, "regenerate": "true"}
+    async with client.stream("GET", f"{base_url}/generate/stream", params=params) as response:
+        async for line in response.aiter_lines():
+            if line == "event: done":
+                break
+    return time.perf_counter() - start
+
+
+async def probe_home(client, base_url, stop, latencies):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get(f"{base_url}/")
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.1)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def run_level(base_url, repo_urls, label):
+    async with httpx.AsyncClient(timeout=None) as client:
+        stop = asyncio.Event()
+        home_latencies = []
+        prober = asyncio.create_task(probe_home(client, base_url, stop, home_latencies))
+        start = time.perf_counter()
+        durations = await asyncio.gather(*[generate(client, base_url, repo_url) for repo_url in repo_urls])
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await prober
+
+    print(
+        f"concurrency {len(repo_urls):>3} {label:11}: {len(repo_urls) / elapsed:6.2f} requests/s, "
+        f"generation p50 {statistics.median(durations):6.2f}s, "
+        f"home p50 {1000 * percentile(home_latencies, 50):7.1f}ms "
+        f"p95 {1000 * percentile(home_latencies, 95):7.1f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:5001")
+    parser.add_argument("--repo", action="append", dest="repos", help="Repository URL (repeatable)")
+    parser.add_argument("--levels", nargs="+", type=int, default=[1, 2, 4, 8])
+    args = parser.parse_args()
+    # The server coalesces requests per normalized URL, so variants that differ
+    # only in case or a trailing slash count as one repository.
+    distinct = {}
+    for url in args.repos or DEFAULT_REPOS:
+        distinct.setdefault(url.lower().rstrip("/"), url)
+    repos = list(distinct.values())
+    if len(repos) < max(args.levels):
+        parser.error(
+            f"{len(repos)} distinct repositories given; the independent run at concurrency {max(args.levels)} "
+            f"needs at least {max(args.levels)}"
+        )
+
+    for concurrency in args.levels:
+        await run_level(args.base_url, repos[:concurrency], "independent")
+        if concurrency > 1:
+            await run_level(args.base_url, [repos[0]] * concurrency, "coalesced")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
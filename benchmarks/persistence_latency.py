@@ -0,0 +1,62 @@
+"""Show that request latency no longer includes the embedding and insert calls.
+
+Simulates the save step of /generate with slow fake embedding and insert
+backends, once inline (the old behaviour) and once through PersistenceQueue.
+
+    python -m benchmarks.persistence_latency
+"""
+import asyncio
+import time
+
+from helpers.persistence import PersistenceQueue
+
+EMBEDDING_LATENCY = 0.8
+INSERT_LATENCY = 0.4
+REQUESTS = 8
+
+calls = {"embed": 0, "insert": 0}
+
+
+def slow_embed(texts):
+    calls["embed"] += 1
+    time.sleep(EMBEDDING_LATENCY)
+    return [[0.0] * 4 for _ in texts]
+
+
+def slow_insert(rows):
+    calls["insert"] += 1
+    time.sleep(INSERT_LATENCY)
+
+
+async def inline_request(index):
+    start = time.perf_counter()
+    row = {"url": f"https://github.com/example/repo{index}"}
+    row["embedding"] = (await asyncio.to_thread(slow_embed, ["context"]))[0]
+    await asyncio.to_thread(slow_insert, [row])
+    return time.perf_counter() - start
+
+
+async def queued_request(queue, index):
+    start = time.perf_counter()
+    await queue.put({"url": f"https://github.com/example/repo{index}"}, "context")
+    return time.perf_counter() - start
+
+
+async def main():
+    inline = await asyncio.gather(*[inline_request(i) for i in range(REQUESTS)])
+    print(f"inline: mean request latency {1000 * sum(inline) / REQUESTS:.1f} ms, "
+          f"{calls['embed']} embedding calls, {calls['insert']} insert calls")
+
+    calls.update(embed=0, insert=0)
+    queue = PersistenceQueue(slow_embed, slow_insert, batch_size=REQUESTS, flush_interval=0.2)
+    start = time.perf_counter()
+    queued = await asyncio.gather(*[queued_request(queue, i) for i in range(REQUESTS)])
+    await queue.drain()
+    print(f"queued: mean request latency {1000 * sum(queued) / REQUESTS:.3f} ms, "
+          f"{calls['embed']} embedding calls, {calls['insert']} insert calls, "
+          f"background drain {time.perf_counter() - start:.2f} s")
+    assert max(queued) < EMBEDDING_LATENCY / 10, "request latency still includes persistence"
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
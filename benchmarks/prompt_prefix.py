@@ -0,0 +1,51 @@
+"""Cacheable prompt prefix shared by requests for two different repositories.
+
+Providers cache the longest prefix a request shares with earlier ones (tool
+definitions, then messages in order). With the repository context first, two
+repositories only shared the tool definition; with the static instructions
+and example in the system message, they share those too.
+
+    python -m benchmarks.prompt_prefix
+"""
+import json
+import os
+
+from instructor.function_calls import openai_schema
+
+from helpers.jinja_helper import render_template
+from helpers.token_helpers import count_tokens
+from schemas import DevContainerModel
+
+REPOS = {
+    "https://github.com/example/flask-app": "requirements.txt\nflask==3.0.0\n" * 200,
+    "https://github.com/example/node-api": "package.json\n{\"dependencies\": {\"express\": \"^4\"}}\n" * 200,
+}
+
+
+def request_text(system, user):
+    # The parts of a chat request in the order the provider hashes them
+    tools = json.dumps(openai_schema(DevContainerModel).openai_schema)
+    return tools + system + user
+
+
+def previous_layout(repo_url, repo_context):
+    # Before: everything in the user message, repository context first
+    user = render_template("prompts/devcontainer.jinja", repo_url=repo_url, repo_context=repo_context)
+    static = render_template("prompts/devcontainer_system.jinja").split("\n\n", 1)[1]
+    return request_text("You are a helpful assistant that generates devcontainer.json files.", user + "\n\n" + static)
+
+
+def current_layout(repo_url, repo_context):
+    user = render_template("prompts/devcontainer.jinja", repo_url=repo_url, repo_context=repo_context)
+    return request_text(render_template("prompts/devcontainer_system.jinja"), user)
+
+
+def main():
+    for name, layout in [("repository context first", previous_layout), ("static system prefix", current_layout)]:
+        first, second = [layout(url, context) for url, context in REPOS.items()]
+        shared = count_tokens(os.path.commonprefix([first, second]))
+        print(f"{name}: {shared} of {count_tokens(second)} prompt tokens shared between repositories")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Prompt render time with a per-call Environment versus the shared, precompiled one.
+
+    python -m benchmarks.prompt_render
+"""
+import time
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from helpers.jinja_helper import render_stats, render_template
+
+RENDERS = 200
+TEMPLATE = "prompts/devcontainer.jinja"
+DATA = {
+    "repo_url": "https://github.com/example/repo",
+    "repo_context": "\n".join(f"line {i} of a large repository context" for i in range(20_000)),
+    "existing_devcontainer": None,
+}
+
+
+def per_call_environment():
+    env = Environment(loader=FileSystemLoader(searchpath="./"), autoescape=select_autoescape())
+    return env.get_template(TEMPLATE).render(**DATA)
+
+
+def main():
+    start = time.perf_counter()
+    for _ in range(RENDERS):
+        old = per_call_environment()
+    per_call = (time.perf_counter() - start) / RENDERS
+
+    start = time.perf_counter()
+    for _ in range(RENDERS):
+        new = render_template(TEMPLATE, **DATA)
+    shared = (time.perf_counter() - start) / RENDERS
+
+    assert old == new
+    print(f"new Environment per render: {1000 * per_call:.3f} ms")
+    print(f"shared precompiled template: {1000 * shared:.3f} ms ({per_call / shared:.1f}x)")
+    print(f"render_stats: {render_stats}")
+
+
+if __name__ == "__main__":
+    main()
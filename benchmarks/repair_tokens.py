@@ -0,0 +1,90 @@
+"""Prompt tokens per successful generation: full resends versus targeted repairs.
+
+Before, a draft that failed schema validation was thrown away and the whole
+prompt, repository context included, was sent again. Now the follow-up only
+carries the draft and its validation errors. Drafts come from a stub client
+that returns schema-invalid JSON a given number of times before a valid one;
+tokens include the tool definition sent with every call.
+
+    python -m benchmarks.repair_tokens
+"""
+import asyncio
+import json
+from typing import Optional
+
+from instructor.function_calls import openai_schema
+from pydantic import BaseModel, Field
+
+from helpers.context_helpers import RepoContext, make_section
+from helpers.devcontainer_helpers import generate_devcontainer_json
+from helpers.token_helpers import count_tokens
+from schemas import DevContainerModel
+
+INVALID_DRAFT = {"name": "demo", "image": "python:3.12", "forwardPorts": [70000, "localhost"]}
+VALID_DRAFT = {"name": "demo", "image": "python:3.12", "forwardPorts": [8000, "db:5432"]}
+
+
+class LegacyDevContainerModel(BaseModel):
+    # The hand-written response model used before it was derived from the schema
+    name: str = Field(description="Name of the dev container")
+    image: str = Field(description="Docker image to use")
+    forwardPorts: Optional[list[int]] = Field(description="Ports to forward from the container to the local machine")
+    customizations: Optional[dict] = Field(None, description="Tool-specific configuration")
+    settings: Optional[dict] = Field(None, description="VS Code settings to configure the development environment")
+    postCreateCommand: Optional[str] = Field(description="Command to run after creating the container")
+
+
+def schema_tokens(model):
+    return count_tokens(json.dumps(openai_schema(model).openai_schema))
+
+
+def message_tokens(messages):
+    return sum(count_tokens(message["content"]) for message in messages)
+
+
+class StubCompletions:
+    def __init__(self, failures):
+        self.failures = failures
+        self.prompt_tokens = []
+
+    async def create(self, model=None, response_model=None, messages=None, **kwargs):
+        self.prompt_tokens.append(message_tokens(messages) + schema_tokens(DevContainerModel))
+        draft = INVALID_DRAFT if len(self.prompt_tokens) <= self.failures else VALID_DRAFT
+        return DevContainerModel.model_validate(draft)
+
+
+class StubClient:
+    def __init__(self, failures):
+        self.chat = type("Chat", (), {})()
+        self.chat.completions = StubCompletions(failures)
+
+
+def repository_context(tokens):
+    line = "dependency-name==1.2.3  # pinned for reproducible builds\n"
+    lines_needed = tokens // max(count_tokens(line), 1)
+    return RepoContext(sections=[
+        make_section("Repository Structure", "src/\n    app.py\nrequirements.txt"),
+        make_section("Content of requirements.txt", line * lines_needed),
+    ])
+
+
+async def main():
+    legacy_schema = schema_tokens(LegacyDevContainerModel)
+    print(f"tool definition: {legacy_schema} tokens before, {schema_tokens(DevContainerModel)} tokens now")
+    for context_tokens in (8_000, 60_000, 126_000):
+        repo_context = repository_context(context_tokens)
+        for failures in (0, 1, 2):
+            client = StubClient(failures)
+            await generate_devcontainer_json(client, "https://github.com/example/repo", repo_context)
+            first_call = client.chat.completions.prompt_tokens[0]
+            full_prompt = first_call - schema_tokens(DevContainerModel) + legacy_schema
+            before = full_prompt * (failures + 1)
+            after = sum(client.chat.completions.prompt_tokens)
+            print(
+                f"{repo_context.tokens:>7} context tokens, {failures} invalid drafts: "
+                f"{before:>8} prompt tokens before, {after:>8} now ({before / after:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
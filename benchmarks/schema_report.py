@@ -0,0 +1,128 @@
+"""Compare table size and lookup latency before and after the schema v2 migrations.
+
+Seeds two throwaway schemas in the database at BENCHMARK_DB_URL (or
+SUPABASE_DB_URL) with the same regenerate-heavy dataset. bench_v1 stops at
+migration 004, as the table looked before the url index and repo_contexts;
+bench_v2 is seeded at the same point and then migrated, which also exercises
+the context backfill. Both schemas are dropped afterwards.
+
+    python -m benchmarks.schema_report --repos 2000 --regenerations 3
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+import psycopg2
+from dotenv import load_dotenv
+
+from migrate import apply_migrations
+
+LOOKUP_SQL = (
+    "SELECT id, url, devcontainer_json, devcontainer_url, generated, commit_sha, created_at "
+    "FROM devcontainers WHERE url = %s ORDER BY created_at DESC LIMIT 1"
+)
+
+WORDS = "install run test build python node docker compose port env config dev server app lint".split()
+
+
+def fake_context(rng, repo):
+    files = [
+        f"## Content of {name}\n" + "\n".join(
+            f"{name}-{repo}-{line}: " + " ".join(rng.choice(WORDS) for _ in range(12)) for line in range(40)
+        )
+        for name in ("README.md", "requirements.txt", "package.json", "Dockerfile", "Makefile")
+    ]
+    return "\n\n".join(files)
+
+
+def seed(cursor, repos, regenerations, rng):
+    row_id = 0
+    for repo in range(repos):
+        context = fake_context(rng, repo)
+        rows = []
+        for _ in range(regenerations):
+            row_id += 1
+            rows.append((
+                row_id, f"https://github.com/example/repo{repo}", '{"name": "example"}', None,
+                context, len(context) // 4, "gpt-4o", True,
+            ))
+        cursor.executemany(
+            "INSERT INTO devcontainers (id, url, devcontainer_json, devcontainer_url, repo_context, tokens, model, generated) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+            rows,
+        )
+
+
+def table_sizes(cursor, schema):
+    cursor.execute(
+        "SELECT relname, pg_total_relation_size(c.oid) FROM pg_class c "
+        "JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE n.nspname = %s AND relkind = 'r' AND relname IN ('devcontainers', 'repo_contexts')",
+        (schema,),
+    )
+    return dict(cursor.fetchall())
+
+
+def lookup_latency(cursor, repos, queries, rng):
+    timings = []
+    for _ in range(queries):
+        url = f"https://github.com/example/repo{rng.randrange(repos)}"
+        start = time.perf_counter()
+        cursor.execute(LOOKUP_SQL, (url,))
+        cursor.fetchall()
+        timings.append(1000 * (time.perf_counter() - start))
+    timings.sort()
+    return statistics.median(timings), timings[int(0.95 * len(timings)) - 1]
+
+
+def build(connection, schema, args, migrate_after_seed):
+    with connection, connection.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE; CREATE SCHEMA {schema}; SET search_path TO {schema}")
+    apply_migrations(connection, until="004")
+    with connection, connection.cursor() as cursor:
+        seed(cursor, args.repos, args.regenerations, random.Random(0))
+    if migrate_after_seed:
+        apply_migrations(connection)
+    # Reclaim the space of rows rewritten by the migration so sizes compare
+    # live data only; VACUUM cannot run inside a transaction.
+    connection.autocommit = True
+    try:
+        with connection.cursor() as cursor:
+            for table in ("devcontainers", "repo_contexts") if migrate_after_seed else ("devcontainers",):
+                cursor.execute(f"VACUUM FULL ANALYZE {table}")
+    finally:
+        connection.autocommit = False
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repos", type=int, default=2000)
+    parser.add_argument("--regenerations", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    database_url = os.getenv("BENCHMARK_DB_URL") or os.getenv("SUPABASE_DB_URL")
+    if not database_url:
+        raise SystemExit("Set BENCHMARK_DB_URL or SUPABASE_DB_URL to a database the benchmark may create schemas in")
+
+    connection = psycopg2.connect(database_url)
+    try:
+        for schema, migrate_after_seed in (("bench_v1", False), ("bench_v2", True)):
+            build(connection, schema, args, migrate_after_seed)
+            with connection, connection.cursor() as cursor:
+                sizes = table_sizes(cursor, schema)
+                median, p95 = lookup_latency(cursor, args.repos, args.queries, random.Random(1))
+            total = sum(sizes.values())
+            detail = ", ".join(f"{name} {size / 1024 / 1024:.1f} MB" for name, size in sorted(sizes.items()))
+            print(f"{schema}: {total / 1024 / 1024:.1f} MB ({detail}); lookup median {median:.2f} ms, p95 {p95:.2f} ms")
+    finally:
+        with connection, connection.cursor() as cursor:
+            cursor.execute("DROP SCHEMA IF EXISTS bench_v1 CASCADE; DROP SCHEMA IF EXISTS bench_v2 CASCADE")
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Compare tokenizer work per /generate before and after section token accounting.
+
+Run from the repository root:
+
+    python -m benchmarks.token_accounting
+"""
+import time
+
+import tiktoken
+
+from helpers import token_helpers
+from helpers.context_helpers import RepoContext, make_section
+from helpers.devcontainer_helpers import truncate_context
+
+EMBEDDING_MODEL = "text-embedding-ada-002"
+EMBEDDING_MAX_TOKENS = 8192
+
+
+def synthetic_sections(file_count, lines_per_file):
+    structure = "\n".join(f"dir{i}/\n    file{i}.py" for i in range(file_count))
+    files = [
+        (f"Content of file{i}.txt", "\n".join(f"package-{i}-{n}==1.{n}.0" for n in range(lines_per_file)))
+        for i in range(file_count)
+    ]
+    return [("Repository Structure", structure), *files, ("Repository Languages", "Python: 1000 lines")]
+
+
+def legacy_pipeline(sections, max_tokens):
+    # Mirrors the pre-accounting code path: a fresh encoder lookup and a full
+    # encode for every count, then repeated encodes of the joined context.
+    calls = 0
+    encoded = 0
+
+    def encode(text, model="gpt-4o"):
+        nonlocal calls, encoded
+        calls += 1
+        tokens = tiktoken.encoding_for_model(model).encode(text)
+        encoded += len(tokens)
+        return tokens
+
+    texts = [f"<<SECTION: {title} >>\n{body}\n<<END_SECTION: {title} >>" for title, body in sections]
+    for text in texts:
+        len(encode(text))
+    context = "\n\n".join(texts)
+    tokens = encode(context, "gpt-4o-mini")
+    if len(tokens) > max_tokens:
+        languages_end = context.find("<<END_SECTION: Repository Languages >>")
+        important = context[:languages_end] + "<<END_SECTION: Repository Languages >>\n\n"
+        remaining = context[languages_end + len("<<END_SECTION: Repository Languages >>\n\n"):]
+        important_tokens = encode(important, "gpt-4o-mini")
+        if len(important_tokens) <= max_tokens:
+            final = important + tiktoken.encoding_for_model("gpt-4o-mini").decode(
+                encode(remaining, "gpt-4o-mini")[:max_tokens - len(important_tokens)]
+            )
+            encode(final, "gpt-4o-mini")
+    encode(context, EMBEDDING_MODEL)
+    len(encode(context))
+    return calls, encoded
+
+
+def current_pipeline(sections, max_tokens):
+    calls_before = token_helpers.encode_stats["calls"]
+    tokens_before = token_helpers.encode_stats["tokens"]
+    repo_context = RepoContext(sections=[make_section(title, body) for title, body in sections])
+    truncate_context(repo_context, max_tokens=max_tokens)
+    token_helpers.truncate_to_token_limit(repo_context.text, EMBEDDING_MODEL, EMBEDDING_MAX_TOKENS)
+    repo_context.tokens
+    return (
+        token_helpers.encode_stats["calls"] - calls_before,
+        token_helpers.encode_stats["tokens"] - tokens_before,
+    )
+
+
+def measure(pipeline, sections, max_tokens):
+    start = time.process_time()
+    calls, encoded = pipeline(sections, max_tokens)
+    return calls, encoded, time.process_time() - start
+
+
+def main():
+    for file_count, lines_per_file in [(10, 50), (25, 500), (25, 5000)]:
+        sections = synthetic_sections(file_count, lines_per_file)
+        # Warm the encoder caches so neither side pays the one-off BPE load
+        token_helpers.count_tokens("warm up")
+        tiktoken.encoding_for_model(EMBEDDING_MODEL).encode("warm up")
+
+        legacy_calls, legacy_tokens, legacy_cpu = measure(legacy_pipeline, sections, 126000)
+        current_calls, current_tokens, current_cpu = measure(current_pipeline, sections, 126000)
+        print(
+            f"{file_count} files x {lines_per_file} lines: "
+            f"legacy {legacy_calls} encodes / {legacy_tokens} tokens / {legacy_cpu * 1000:.1f} ms CPU, "
+            f"current {current_calls} encodes / {current_tokens} tokens / {current_cpu * 1000:.1f} ms CPU"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Validations per second of a generated devcontainer.json.
+
+Compares the old per-call path (re-read the schema, parse the serialized JSON,
+jsonschema.validate) with the validator compiled once in helpers.validation.
+
+    python -m benchmarks.validation
+"""
+import json
+import time
+
+import jsonschema
+
+from helpers.validation import SCHEMA_PATH, get_validator, validate_devcontainer
+from schemas import DevContainerModel
+
+DEVCONTAINER = DevContainerModel(
+    name="Python 3",
+    image="mcr.microsoft.com/devcontainers/python:3.12-bookworm",
+    forwardPorts=[8000, 5432],
+    postCreateCommand="pip install -r requirements.txt",
+    customizations={"vscode": {"extensions": ["ms-python.python"]}},
+)
+
+
+def reload_and_validate(devcontainer_json):
+    with open(SCHEMA_PATH) as schema_file:
+        schema = json.load(schema_file)
+    jsonschema.validate(instance=json.loads(devcontainer_json), schema=schema)
+
+
+def per_second(func, seconds=1.0):
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        func()
+        calls += 1
+    return calls / (time.perf_counter() - start)
+
+
+def main():
+    devcontainer_json = json.dumps(DEVCONTAINER.model_dump(exclude_none=True), indent=2)
+    baseline = per_second(lambda: reload_and_validate(devcontainer_json))
+    print(f"reload + jsonschema.validate: {baseline:,.0f}/s")
+
+    get_validator()  # compile outside the timed loop
+    assert validate_devcontainer(DEVCONTAINER) == []
+    rate = per_second(lambda: validate_devcontainer(DEVCONTAINER))
+    print(f"compiled validator (model, no JSON round-trip): {rate:,.0f}/s ({rate / baseline:.0f}x)")
+
+    invalid = {"name": "broken", "image": 42, "forwardPorts": "8000"}
+    print(f"errors for an invalid document: {validate_devcontainer(invalid)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Measure nearest-neighbour lookup latency of EmbeddingIndex.
+
+Fills an index with random unit vectors (ada-002 sized by default) and times
+single-query and batched top-k searches against a plain Python loop over a
+sample of the rows, then compares loading embeddings from JSON text, from
+encoded blobs and from a memory-mapped snapshot.
+
+    python -m benchmarks.vector_search --rows 100000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from helpers.embedding_codec import FORMATS, decode_embedding, encode_embedding
+from helpers.vector_index import EmbeddingIndex
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def python_top_k(query, vectors, k):
+    scores = [sum(a * b for a, b in zip(query, vector)) for vector in vectors]
+    return sorted(range(len(scores)), key=scores.__getitem__, reverse=True)[:k]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    index = EmbeddingIndex()
+    start = time.perf_counter()
+    for offset in range(0, args.rows, 10_000):
+        count = min(10_000, args.rows - offset)
+        index.add(
+            [{"url": f"https://github.com/example/repo{offset + i}"} for i in range(count)],
+            rng.standard_normal((count, args.dim), dtype=np.float32),
+        )
+    print(f"built index of {len(index)} x {args.dim} in {time.perf_counter() - start:.2f} s")
+
+    queries = rng.standard_normal((args.batch, args.dim), dtype=np.float32)
+    single = timed(lambda: index.search(queries[0], args.k), args.repeat)
+    batched = timed(lambda: index.search(queries, args.k), args.repeat)
+    print(f"single query: {1000 * single:.2f} ms")
+    print(f"batch of {args.batch}: {1000 * batched:.2f} ms ({1000 * batched / args.batch:.2f} ms per query)")
+
+    sample = 1000
+    vectors = index._vectors[:sample].tolist()
+    query = queries[0].tolist()
+    loop = timed(lambda: python_top_k(query, vectors, args.k), 1)
+    print(f"python loop: {1000 * loop:.2f} ms for {sample} rows, "
+          f"~{loop * len(index) / sample:.2f} s extrapolated to {len(index)} rows")
+
+    # An exact copy of a stored vector must come back first with similarity 1
+    (similarity, entry), *_ = index.search(index._vectors[42], args.k)[0]
+    assert entry["url"].endswith("repo42") and similarity > 0.999
+
+    stored = index._vectors[:sample]
+    texts = [json.dumps(vector.tolist()) for vector in stored]
+    parse = timed(lambda: [json.loads(text) for text in texts], 1)
+    print(f"json text: {sum(map(len, texts)) / sample / 1024:.1f} KB per row, "
+          f"{1000 * parse / sample:.3f} ms per row to parse")
+    for dtype in FORMATS:
+        blobs = [encode_embedding(vector, dtype) for vector in stored]
+        decode = timed(lambda: [decode_embedding(blob) for blob in blobs], 1)
+        print(f"{dtype} blob: {sum(map(len, blobs)) / sample / 1024:.1f} KB per row, "
+              f"{1000 * decode / sample:.3f} ms per row to decode")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "index")
+        index.save(path)
+        start = time.perf_counter()
+        loaded = EmbeddingIndex.load(path)
+        opened = time.perf_counter() - start
+        first = timed(lambda: loaded.search(queries[0], args.k), 1)
+        print(f"snapshot: opened {len(loaded)} rows in {1000 * opened:.1f} ms, first query {1000 * first:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import hashlib
+import logging
+import re
+from pydantic import BaseModel
+from helpers.token_helpers import count_tokens, encode, get_encoding
+
+SECTION_SEPARATOR = "\n\n"
+SECTION_PATTERN = re.compile(r"<<SECTION: (.*?) >>\n(.*?)\n<<END_SECTION: \1 >>", re.DOTALL)
+
+class ContextSection(BaseModel):
+    title: str
+    body: str
+    tokens: int
+
+    @property
+    def text(self):
+        return f"<<SECTION: {self.title} >>\n{self.body}\n<<END_SECTION: {self.title} >>"
+
+def make_section(title, body):
+    """Build a section and count its tokens, the only encode it will ever need."""
+    section = ContextSection(title=title, body=body, tokens=0)
+    section.tokens = count_tokens(section.text)
+    return section
+
+class RepoContext(BaseModel):
+    """Repository context as ordered sections with precomputed token counts."""
+    sections: list[ContextSection] = []
+
+    @property
+    def text(self):
+        return SECTION_SEPARATOR.join(section.text for section in self.sections)
+
+    @property
+    def tokens(self):
+        # Sum of per-section counts plus one token per separator. BPE merges
+        # across section boundaries can shift this by a few tokens at most.
+        return sum(section.tokens for section in self.sections) + max(len(self.sections) - 1, 0)
+
+    def section(self, title):
+        return next((section for section in self.sections if section.title == title), None)
+
+    @classmethod
+    def from_text(cls, text):
+        """Rebuild sections from a stored context string."""
+        return cls(sections=[make_section(title, body) for title, body in SECTION_PATTERN.findall(text)])
+
+# Lower numbers are kept first when the context has to fit a token budget.
+PRIORITY_ESSENTIAL = 0
+PRIORITY_EXISTING_DEVCONTAINER = 1
+PRIORITY_MANIFEST = 2
+PRIORITY_LOCKFILE_HEADER = 3
+PRIORITY_README = 4
+PRIORITY_OTHER = 5
+PRIORITY_LOCKFILE_BODY = 6
+
+ESSENTIAL_SECTIONS = ["Repository Structure", "Repository Languages"]
+MANIFEST_FILES = [
+    "requirements.txt", "Dockerfile", "package.json", "Gemfile", ".env.example",
+    "Pipfile", "setup.py", "pyproject.toml", "CMakeLists.txt", "Makefile",
+    "go.mod", "pom.xml", "build.gradle", "Cargo.toml", "composer.json",
+    "phpunit.xml", "mix.exs", "pubspec.yaml", "stack.yaml", "DESCRIPTION",
+    "NAMESPACE", "Rakefile",
+]
+LOCKFILES = ["Pipfile.lock", "Cargo.lock", "go.sum"]
+LOCKFILE_HEADER_TOKENS = 1000
+# Truncated sections shorter than this are dropped rather than kept as stubs
+MIN_TRUNCATED_BODY_TOKENS = 32
+TRUNCATION_NOTE = "... (truncated)"
+
+def context_hash(text):
+    """Key of a context in the content-addressed repo_contexts table."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _budget_claims(index, section):
+    """Return (priority, index, token cap) claims for one section."""
+    filename = section.title.removeprefix("Content of ")
+    if section.title in ESSENTIAL_SECTIONS:
+        return [(PRIORITY_ESSENTIAL, index, section.tokens)]
+    if section.title == "Existing devcontainer.json":
+        return [(PRIORITY_EXISTING_DEVCONTAINER, index, section.tokens)]
+    if filename in MANIFEST_FILES:
+        return [(PRIORITY_MANIFEST, index, section.tokens)]
+    if filename in LOCKFILES:
+        return [
+            (PRIORITY_LOCKFILE_HEADER, index, min(section.tokens, LOCKFILE_HEADER_TOKENS)),
+            (PRIORITY_LOCKFILE_BODY, index, section.tokens),
+        ]
+    if filename == "README.md":
+        return [(PRIORITY_README, index, section.tokens)]
+    return [(PRIORITY_OTHER, index, section.tokens)]
+
+def _truncate_section(section, token_budget):
+    overhead = count_tokens(
+        f"<<SECTION: {section.title} >>\n\n{TRUNCATION_NOTE}\n<<END_SECTION: {section.title} >>"
+    )
+    body_tokens = token_budget - overhead
+    if body_tokens < MIN_TRUNCATED_BODY_TOKENS:
+        return None
+    body = get_encoding().decode(encode(section.body)[:body_tokens])
+    return f"<<SECTION: {section.title} >>\n{body}\n{TRUNCATION_NOTE}\n<<END_SECTION: {section.title} >>"
+
+def assemble_context(repo_context, max_tokens):
+    """Fit the context into max_tokens, spending the budget by section priority.
+
+    Sections keep their original order in the output; lower-priority ones are
+    shortened or dropped first. Only sections that are actually cut get
+    re-encoded.
+    """
+    sections = repo_context.sections
+    if repo_context.tokens <= max_tokens:
+        return repo_context.text
+
+    budget = max_tokens - max(len(sections) - 1, 0)
+    allocations = [0] * len(sections)
+    claims = sorted(claim for index, section in enumerate(sections) for claim in _budget_claims(index, section))
+    for priority, index, cap in claims:
+        grant = min(cap - allocations[index], budget)
+        if grant > 0:
+            allocations[index] += grant
+            budget -= grant
+
+    texts = []
+    for section, allocation in zip(sections, allocations):
+        if allocation >= section.tokens:
+            texts.append(section.text)
+        elif allocation > 0:
+            truncated = _truncate_section(section, allocation)
+            if truncated is not None:
+                texts.append(truncated)
+                logging.info(f"Truncated section '{section.title}' from {section.tokens} to {allocation} tokens")
+            else:
+                logging.info(f"Dropped section '{section.title}' ({section.tokens} tokens)")
+        else:
+            logging.info(f"Dropped section '{section.title}' ({section.tokens} tokens)")
+    return SECTION_SEPARATOR.join(texts)
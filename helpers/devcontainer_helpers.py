@@ -3,69 +3,39 @@
 import json
 import logging
 import os
-import jsonschema
-import tiktoken
-from helpers.jinja_helper import process_template
+import time
+import instructor
+from helpers.context_helpers import assemble_context
+from helpers.executor import run_blocking
+from helpers.jinja_helper import render_template
+from helpers.metrics import record_llm_attempt, record_tokens, record_usage, span
+from helpers.openai_helpers import choose_model, escalation_model
+from helpers.storage import get_storage
+from helpers.token_helpers import count_tokens
+from helpers.validation import validate_devcontainer
 from schemas import DevContainerModel
-from supabase_client import supabase
 from models import DevContainer
 
+def truncate_context(repo_context, max_tokens=120000):
+    if repo_context.tokens <= max_tokens:
+        return repo_context.text
 
-import logging
-import tiktoken
-
-def truncate_context(context, max_tokens=120000):
-    logging.info(f"Starting truncate_context with max_tokens={max_tokens}")
-    logging.debug(f"Initial context length: {len(context)} characters")
-
-    encoding = tiktoken.encoding_for_model("gpt-4o-mini")
-    tokens = encoding.encode(context)
-
-    logging.info(f"Initial token count: {len(tokens)}")
-
-    if len(tokens) <= max_tokens:
-        logging.info("Context is already within token limit. No truncation needed.")
-        return context
-
-    logging.info(f"Context size is {len(tokens)} tokens. Truncation needed.")
-
-    # Prioritize keeping the repository structure and languages
-    structure_end = context.find("<<END_SECTION: Repository Structure >>")
-    languages_end = context.find("<<END_SECTION: Repository Languages >>")
-
-    logging.debug(f"Structure end position: {structure_end}")
-    logging.debug(f"Languages end position: {languages_end}")
-
-    important_content = context[:languages_end] + "<<END_SECTION: Repository Languages >>\n\n"
-    remaining_content = context[languages_end + len("<<END_SECTION: Repository Languages >>\n\n"):]
-
-    important_tokens = encoding.encode(important_content)
-    logging.debug(f"Important content token count: {len(important_tokens)}")
+    logging.info(f"Context size is {repo_context.tokens} tokens. Assembling within {max_tokens}.")
+    return assemble_context(repo_context, max_tokens)
 
-    if len(important_tokens) > max_tokens:
-        logging.warning("Important content alone exceeds max_tokens. Truncating important content.")
-        important_content = encoding.decode(important_tokens[:max_tokens])
-        return important_content
+async def generate_devcontainer_json(instructor_client, repo_url, repo_context, devcontainer_url=None, max_retries=2, regenerate=False, on_partial=None, similar_devcontainer=None, report=None):
+    """Generate (devcontainer_json, devcontainer_url) for a repository.
 
-    remaining_tokens = max_tokens - len(important_tokens)
-    logging.info(f"Tokens available for remaining content: {remaining_tokens}")
-
-    truncated_remaining = encoding.decode(encoding.encode(remaining_content)[:remaining_tokens])
-
-    final_context = important_content + truncated_remaining
-    final_tokens = encoding.encode(final_context)
-
-    logging.info(f"Final token count: {len(final_tokens)}")
-    logging.debug(f"Final context length: {len(final_context)} characters")
-
-    return final_context
-
-def generate_devcontainer_json(instructor_client, repo_url, repo_context, devcontainer_url=None, max_retries=2, regenerate=False):
+    The first attempt goes to the deployment choose_model picks for the
+    context size; after a failed attempt the rest go to escalation_model. If
+    report is a dict it receives the model that produced the result,
+    generation_ms and attempts.
+    """
     existing_devcontainer = None
-    if "<<EXISTING_DEVCONTAINER>>" in repo_context:
+    if "<<EXISTING_DEVCONTAINER>>" in repo_context.text:
         logging.info("Existing devcontainer.json found in the repository.")
         existing_devcontainer = (
-            repo_context.split("<<EXISTING_DEVCONTAINER>>")[1]
+            repo_context.text.split("<<EXISTING_DEVCONTAINER>>")[1]
             .split("<<END_EXISTING_DEVCONTAINER>>")[0]
             .strip()
         )
@@ -76,64 +46,124 @@ def generate_devcontainer_json(instructor_client, repo_url, repo_context, devcon
     logging.info("Generating devcontainer.json...")
 
     # Truncate the context to fit within token limits
-    truncated_context = truncate_context(repo_context, max_tokens=126000)
+    with span("truncate"):
+        truncated_context = await run_blocking(truncate_context, repo_context, max_tokens=126000)
 
     template_data = {
         "repo_url": repo_url,
         "repo_context": truncated_context,
-        "existing_devcontainer": existing_devcontainer
+        "existing_devcontainer": existing_devcontainer,
+        "similar_devcontainer": similar_devcontainer,
     }
 
-    prompt = process_template("prompts/devcontainer.jinja", template_data)
-
+    # The static instructions and example go first, identical on every call,
+    # so the provider can serve them from its prompt cache; only the
+    # repository-specific part after them is new input.
+    with span("prompt_render"):
+        system_prompt = render_template("prompts/devcontainer_system.jinja")
+        prompt = render_template("prompts/devcontainer.jinja", **template_data)
+
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt},
+    ]
+    devcontainer, errors = None, []
+    model = choose_model(repo_context.tokens)
+    start = time.perf_counter()
     for attempt in range(max_retries + 1):
+        if attempt > 0 and model != escalation_model():
+            logging.info(f"Escalating from {model} to {escalation_model()} after a failed attempt")
+            model = escalation_model()
+        outcome = "error"
         try:
-            logging.debug(f"Attempt {attempt + 1} to generate devcontainer.json")
-            response = instructor_client.chat.completions.create(
-                model=os.getenv("MODEL"),
-                response_model=DevContainerModel,
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that generates devcontainer.json files."},
-                    {"role": "user", "content": prompt},
-                ],
-            )
-            devcontainer_json = json.dumps(response.dict(exclude_none=True), indent=2)
-
-            if validate_devcontainer_json(devcontainer_json):
-                logging.info("Successfully generated and validated devcontainer.json")
+            if devcontainer is not None:
+                # The draft and its errors are all the model needs to fix it;
+                # resending the full prompt would pay for the context again.
+                logging.info(f"Repairing {len(errors)} validation errors in the previous draft")
+                attempt_messages = repair_messages(devcontainer, errors)
+            else:
+                attempt_messages = messages
+            with span("llm_attempt"):
+                response = await request_devcontainer_model(instructor_client, attempt_messages, on_partial, model)
+            devcontainer = response.model_dump(exclude_none=True)
+            if record_usage(response) is None:
+                # Streamed responses carry no usage; count the output ourselves
+                record_tokens(completion_tokens=count_tokens(json.dumps(devcontainer)))
+
+            with span("validation"):
+                errors = validate_devcontainer(devcontainer)
+            outcome = "invalid" if errors else "valid"
+            if not errors:
+                devcontainer_json = json.dumps(devcontainer, indent=2)
+                logging.info(f"Successfully generated and validated devcontainer.json with {model}")
+                if report is not None:
+                    report.update(
+                        model=model, generation_ms=round(1000 * (time.perf_counter() - start)), attempts=attempt + 1
+                    )
                 if existing_devcontainer and not regenerate:
                     return existing_devcontainer, devcontainer_url
                 else:
                     return devcontainer_json, None  # Return None as URL for generated content
             else:
-                logging.warning(f"Generated JSON failed validation on attempt {attempt + 1}")
+                logging.warning(f"Generated JSON failed validation on attempt {attempt + 1}: {errors}")
                 if attempt == max_retries:
                     raise ValueError("Failed to generate valid devcontainer.json after maximum retries")
         except Exception as e:
             logging.error(f"Error on attempt {attempt + 1}: {str(e)}")
             if attempt == max_retries:
                 raise
+        finally:
+            record_llm_attempt(model, outcome)
 
     raise ValueError("Failed to generate valid devcontainer.json after maximum retries")
 
+def repair_messages(devcontainer, errors):
+    """A follow-up asking the model to fix only the listed validation errors in a draft."""
+    return [
+        {"role": "system", "content": "You are a helpful assistant that fixes devcontainer.json files."},
+        {"role": "user", "content": render_template(
+            "prompts/repair.jinja", draft=json.dumps(devcontainer, indent=2), errors=errors,
+        )},
+    ]
+
+async def request_devcontainer_model(instructor_client, messages, on_partial=None, model=None):
+    model = model or os.getenv("MODEL")
+    if on_partial is not None:
+        return await stream_devcontainer_model(instructor_client, messages, on_partial, model)
+    return await instructor_client.chat.completions.create(
+        model=model,
+        response_model=DevContainerModel,
+        messages=messages,
+    )
+
+async def stream_devcontainer_model(instructor_client, messages, on_partial, model=None):
+    """Stream partial models to the async on_partial callback as JSON and return the final DevContainerModel."""
+    partial = None
+    stream = await instructor_client.chat.completions.create(
+        model=model or os.getenv("MODEL"),
+        response_model=instructor.Partial[DevContainerModel],
+        messages=messages,
+        stream=True,
+    )
+    async for partial in stream:
+        await on_partial(json.dumps(partial.dict(exclude_none=True), indent=2))
+    if partial is None:
+        raise ValueError("LLM stream ended without a response")
+    return DevContainerModel.model_validate(partial.dict())
+
 def validate_devcontainer_json(devcontainer_json):
-    logging.info("Validating devcontainer.json...")
-    schema_path = os.path.join(os.path.dirname(__file__), "..", "schemas", "devContainer.base.schema.json")
-    with open(schema_path, "r") as schema_file:
-        schema = json.load(schema_file)
-    try:
-        logging.debug("Running validation...")
-        jsonschema.validate(instance=json.loads(devcontainer_json), schema=schema)
-        logging.info("Validation successful.")
-        return True
-    except jsonschema.exceptions.ValidationError as e:
-        logging.error(f"Validation failed: {e}")
+    """Validate a devcontainer.json string, model or dict against the schema."""
+    errors = validate_devcontainer(devcontainer_json)
+    if errors:
+        logging.error(f"Validation failed: {errors}")
         return False
+    logging.info("Validation successful.")
+    return True
 
 def save_devcontainer(new_devcontainer):
     try:
-        result = supabase.table("devcontainers").insert(new_devcontainer.dict()).execute()
-        return result.data[0] if result.data else None
+        inserted = get_storage().insert_devcontainers([new_devcontainer.dict()])
+        return inserted[0] if inserted else None
     except Exception as e:
-        logging.error(f"Error saving devcontainer to Supabase: {str(e)}")
+        logging.error(f"Error saving devcontainer: {str(e)}")
         raise
\ No newline at end of file
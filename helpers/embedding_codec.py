@@ -0,0 +1,50 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+# An encoded embedding is one format byte, a float32 scale for int8, then the
+# little-endian components. PostgREST exchanges bytea as "\x"-prefixed hex.
+FORMATS = {"float32": 0, "float16": 1, "int8": 2}
+DTYPES = {0: "<f4", 1: "<f2", 2: "i1"}
+
+
+def encode_embedding(embedding, dtype=None):
+    """Pack an embedding into bytes as float32, float16 or int8 (EMBEDDING_DTYPE)."""
+    dtype = dtype or os.getenv("EMBEDDING_DTYPE", "float32")
+    if dtype not in FORMATS:
+        raise ValueError(f"Unsupported embedding dtype {dtype!r}, expected one of {', '.join(FORMATS)}")
+    vector = np.asarray(embedding, dtype=np.float32)
+    header = bytes([FORMATS[dtype]])
+    if dtype == "int8":
+        scale = float(np.abs(vector).max()) / 127 or 1.0
+        header += struct.pack("<f", scale)
+        vector = np.round(vector / scale)
+    return header + vector.astype(DTYPES[FORMATS[dtype]]).tobytes()
+
+
+def decode_embedding(value):
+    """Return a float32 vector from encoded bytes, PostgREST hex, or legacy JSON text."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        if value.startswith("\\x"):
+            value = bytes.fromhex(value[2:])
+        else:
+            return np.asarray(json.loads(value), dtype=np.float32)
+    elif isinstance(value, (list, tuple)):
+        return np.asarray(value, dtype=np.float32)
+    data = bytes(value)
+    code = data[0]
+    if code not in DTYPES:
+        raise ValueError(f"Unknown embedding format {code}")
+    if code == FORMATS["int8"]:
+        (scale,) = struct.unpack("<f", data[1:5])
+        return np.frombuffer(data, dtype=DTYPES[code], offset=5).astype(np.float32) * scale
+    return np.frombuffer(data, dtype=DTYPES[code], offset=1).astype(np.float32)
+
+
+def to_postgrest(data):
+    """Format encoded bytes for a bytea column written through PostgREST."""
+    return "\\x" + data.hex()
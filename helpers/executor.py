@@ -0,0 +1,20 @@
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Blocking work (the sync Supabase client, SQLite, tiktoken encodes) runs here
+# so it never stalls the event loop. The pool is bounded so a burst of
+# requests queues up instead of spawning unbounded threads.
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("BLOCKING_IO_WORKERS", 16)),
+    thread_name_prefix="blocking-io",
+)
+
+async def run_blocking(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # Run in a copy of the caller's context so metrics spans recorded in the
+    # worker are attributed to the request's trace.
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(context.run, func, *args, **kwargs))
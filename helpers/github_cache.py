@@ -0,0 +1,164 @@
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+CREATE_CACHE_SQL = """
+CREATE TABLE IF NOT EXISTS http_cache (
+  key TEXT PRIMARY KEY,
+  url TEXT,
+  etag TEXT,
+  last_modified TEXT,
+  headers TEXT,
+  body BLOB,
+  size INTEGER,
+  max_age INTEGER,
+  stored_at REAL,
+  last_access REAL
+);
+CREATE INDEX IF NOT EXISTS ix_http_cache_last_access ON http_cache (last_access);
+"""
+
+# Headers describing the transfer rather than the (already decoded) body must
+# not be replayed on a response rebuilt from the cache.
+HOP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+cache_stats = {"hits": 0, "misses": 0, "not_modified": 0}
+_request_stats = contextvars.ContextVar("github_cache_request_stats", default=None)
+
+
+def start_request_stats():
+    """Start counting cache outcomes for the current request (and its tasks)."""
+    stats = {"hits": 0, "misses": 0, "not_modified": 0}
+    _request_stats.set(stats)
+    return stats
+
+
+def record(outcome):
+    cache_stats[outcome] += 1
+    stats = _request_stats.get()
+    if stats is not None:
+        stats[outcome] += 1
+
+
+def cache_key(url, params=None, headers=None):
+    headers = headers or {}
+    # Authorization is hashed into the key so responses fetched with one
+    # token are never replayed for another.
+    parts = [
+        url,
+        json.dumps(params or {}, sort_keys=True),
+        headers.get("Accept", ""),
+        hashlib.sha256(headers.get("Authorization", "").encode()).hexdigest(),
+    ]
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+def _max_age(headers):
+    for directive in headers.get("cache-control", "").split(","):
+        name, _, value = directive.strip().partition("=")
+        if name == "max-age" and value.isdigit():
+            return int(value)
+    return 0
+
+
+class GitHubResponseCache:
+    """Size-bounded LRU store of GitHub responses keyed for conditional requests."""
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(CREATE_CACHE_SQL)
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, headers, body, max_age, stored_at FROM http_cache WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE http_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        etag, last_modified, headers, body, max_age, stored_at = row
+        return {
+            "etag": etag,
+            "last_modified": last_modified,
+            "headers": json.loads(headers),
+            "body": body,
+            "max_age": max_age,
+            "stored_at": stored_at,
+        }
+
+    def put(self, key, url, headers, body):
+        etag = headers.get("etag")
+        last_modified = headers.get("last-modified")
+        if not etag and not last_modified:
+            return
+        stored_headers = {k: v for k, v in headers.items() if k.lower() not in HOP_HEADERS}
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO http_cache "
+                "(key, url, etag, last_modified, headers, body, size, max_age, stored_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, etag, last_modified, json.dumps(stored_headers), body,
+                 len(body), _max_age(headers), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def touch(self, key, headers):
+        # A 304 carries fresh validators and Cache-Control for the stored body.
+        with self._lock:
+            self._conn.execute(
+                "UPDATE http_cache SET max_age = ?, stored_at = ?, etag = COALESCE(?, etag) WHERE key = ?",
+                (_max_age(headers), time.time(), headers.get("etag"), key),
+            )
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM http_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM http_cache ORDER BY last_access ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM http_cache WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        logging.info(f"Evicted {evicted} entries from GitHub response cache")
+
+
+_cache = None
+
+
+def get_cache():
+    global _cache
+    if os.getenv("GITHUB_CACHE_ENABLED", "true").lower() != "true":
+        return None
+    if _cache is None:
+        _cache = GitHubResponseCache(
+            os.getenv("GITHUB_CACHE_PATH", "data/github_cache.db"),
+            int(os.getenv("GITHUB_CACHE_MAX_BYTES", 200 * 1024 * 1024)),
+        )
+    return _cache
+
+
+def is_fresh(entry):
+    # Serving without revalidation is opt-in: "Regenerate" right after a push
+    # should see the new commit, and 304s do not count against the rate limit.
+    max_freshness = int(os.getenv("GITHUB_CACHE_MAX_FRESHNESS", 0))
+    freshness = min(entry["max_age"], max_freshness)
+    return time.time() < entry["stored_at"] + freshness
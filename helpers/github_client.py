@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+from helpers.executor import run_blocking
+from helpers.github_cache import cache_key, get_cache, is_fresh, record
+from helpers.metrics import count_github_request, record_stage
+
+RETRY_STATUS_CODES = {500, 502, 503, 504}
+
+_client = None
+_client_loop = None
+_host_semaphores = {}
+# Optional httpx transport for the shared client; benchmarks install one that
+# replays recorded responses.
+_transport = None
+
+# Latest rate-limit headers seen from the GitHub API, so long-running callers
+# can pace themselves before hitting the limit.
+rate_limit = {"remaining": None, "limit": None, "reset": None}
+
+pool_stats = {
+    "requests": 0,
+    "retries": 0,
+    "errors": 0,
+    "connections_opened": 0,
+    "tls_handshakes": 0,
+    "connect_seconds": 0.0,
+    "request_seconds": 0.0,
+}
+
+
+def _http2_available():
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_client():
+    """Return the process-wide AsyncClient, creating it for the running loop.
+
+    One client is shared by every GitHub call so keep-alive connections (and
+    HTTP/2 streams when h2 is installed) are reused across directories, files
+    and concurrent /generate requests. A client is tied to the event loop that
+    created it, so scripts that call asyncio.run() repeatedly get a fresh one.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        limits = httpx.Limits(
+            max_connections=int(os.getenv("GITHUB_MAX_CONNECTIONS", 20)),
+            max_keepalive_connections=int(os.getenv("GITHUB_MAX_KEEPALIVE_CONNECTIONS", 20)),
+            keepalive_expiry=float(os.getenv("GITHUB_KEEPALIVE_EXPIRY", 30)),
+        )
+        timeout = httpx.Timeout(
+            float(os.getenv("GITHUB_TIMEOUT", 30)),
+            connect=float(os.getenv("GITHUB_CONNECT_TIMEOUT", 10)),
+        )
+        _client = httpx.AsyncClient(
+            limits=limits,
+            timeout=timeout,
+            http2=_http2_available(),
+            follow_redirects=True,
+            transport=_transport,
+        )
+        _client_loop = loop
+        _host_semaphores.clear()
+        logging.info("Created pooled GitHub HTTP client")
+    return _client
+
+
+async def close_client():
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+    _host_semaphores.clear()
+
+
+def set_transport(transport):
+    """Send GitHub requests through transport (None restores the network).
+
+    Takes effect for the next client created, so call it before the first
+    request or after close_client().
+    """
+    global _transport
+    _transport = transport
+
+
+def _host_semaphore(url):
+    host = urlsplit(url).hostname
+    if host not in _host_semaphores:
+        _host_semaphores[host] = asyncio.Semaphore(
+            int(os.getenv("GITHUB_MAX_CONNECTIONS_PER_HOST", 10))
+        )
+    return _host_semaphores[host]
+
+
+def _retry_delay(response, attempt):
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    if response is not None and response.headers.get("x-ratelimit-remaining") == "0":
+        reset = response.headers.get("x-ratelimit-reset")
+        if reset and reset.isdigit():
+            return max(0.0, min(float(reset) - time.time(), float(os.getenv("GITHUB_MAX_BACKOFF", 60))))
+    backoff = float(os.getenv("GITHUB_BACKOFF_BASE", 0.5)) * (2 ** attempt)
+    return min(backoff, float(os.getenv("GITHUB_MAX_BACKOFF", 60))) + random.uniform(0, 0.1)
+
+
+def _should_retry(response):
+    if response.status_code in RETRY_STATUS_CODES or response.status_code == 429:
+        return True
+    if response.status_code == 403:
+        # Primary limit exhaustion and secondary (abuse) limits both surface
+        # as 403; anything else is a genuine permission error.
+        if response.headers.get("x-ratelimit-remaining") == "0" or "retry-after" in response.headers:
+            return True
+        return "secondary rate limit" in response.text.lower()
+    return False
+
+
+def _trace_handler():
+    # httpcore reports connection setup through the "trace" extension, which
+    # tells us whether a request paid for a new TCP/TLS handshake or reused a
+    # pooled connection.
+    started = {}
+
+    async def trace(event_name, info):
+        if event_name == "connection.connect_tcp.started":
+            started["connect"] = time.perf_counter()
+        elif event_name == "connection.connect_tcp.complete":
+            pool_stats["connections_opened"] += 1
+        elif event_name == "connection.start_tls.complete":
+            pool_stats["tls_handshakes"] += 1
+            if "connect" in started:
+                pool_stats["connect_seconds"] += time.perf_counter() - started.pop("connect")
+
+    return trace
+
+
+def _cached_response(url, entry):
+    return httpx.Response(
+        200,
+        headers=entry["headers"],
+        content=entry["body"],
+        request=httpx.Request("GET", url),
+    )
+
+
+async def github_get(url, headers=None, params=None, use_cache=True):
+    """GET a GitHub URL through the shared pool and the conditional-request cache.
+
+    Cached responses are revalidated with If-None-Match/If-Modified-Since and
+    replayed on 304, which GitHub does not count against the rate limit.
+    """
+    cache = get_cache() if use_cache else None
+    if cache is None:
+        return await _send_with_retries(url, headers, params)
+
+    key = cache_key(url, params, headers)
+    entry = await run_blocking(cache.get, key)
+    if entry is not None:
+        if is_fresh(entry):
+            record("hits")
+            return _cached_response(url, entry)
+        headers = dict(headers or {})
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    response = await _send_with_retries(url, headers, params)
+    if response.status_code == 304 and entry is not None:
+        record("not_modified")
+        await run_blocking(cache.touch, key, response.headers)
+        return _cached_response(url, entry)
+
+    record("misses")
+    if response.status_code == 200:
+        await run_blocking(cache.put, key, url, response.headers, response.content)
+    return response
+
+
+async def _send_with_retries(url, headers, params):
+    client = get_client()
+    max_retries = int(os.getenv("GITHUB_MAX_RETRIES", 3))
+
+    for attempt in range(max_retries + 1):
+        response = None
+        start = time.perf_counter()
+        try:
+            async with _host_semaphore(url):
+                pool_stats["requests"] += 1
+                count_github_request()
+                response = await client.get(
+                    url, headers=headers, params=params, extensions={"trace": _trace_handler()}
+                )
+        except httpx.TransportError as e:
+            pool_stats["errors"] += 1
+            if attempt == max_retries:
+                raise
+            logging.warning(f"GitHub request to {url} failed ({e!r}), retrying")
+        finally:
+            elapsed = time.perf_counter() - start
+            pool_stats["request_seconds"] += elapsed
+            record_stage("github_request", elapsed)
+
+        if response is not None:
+            _update_rate_limit(response)
+            if not _should_retry(response) or attempt == max_retries:
+                return response
+            logging.warning(f"GitHub request to {url} returned {response.status_code}, retrying")
+
+        pool_stats["retries"] += 1
+        await asyncio.sleep(_retry_delay(response, attempt))
+
+
+def _update_rate_limit(response):
+    remaining = response.headers.get("x-ratelimit-remaining")
+    if remaining is None or not remaining.isdigit():
+        return
+    rate_limit["remaining"] = int(remaining)
+    limit = response.headers.get("x-ratelimit-limit")
+    reset = response.headers.get("x-ratelimit-reset")
+    rate_limit["limit"] = int(limit) if limit and limit.isdigit() else rate_limit["limit"]
+    rate_limit["reset"] = float(reset) if reset and reset.isdigit() else rate_limit["reset"]
+
+
+async def wait_for_rate_limit(reserve):
+    """Sleep until the rate limit resets if fewer than reserve requests remain."""
+    remaining, reset = rate_limit["remaining"], rate_limit["reset"]
+    if remaining is None or reset is None or remaining >= reserve:
+        return 0.0
+    delay = max(0.0, reset - time.time()) + 1
+    logging.warning(f"GitHub rate limit nearly exhausted ({remaining} left), pausing {delay:.0f}s until reset")
+    await asyncio.sleep(delay)
+    rate_limit["remaining"] = None
+    return delay
+
+
+def get_pool_stats():
+    stats = dict(pool_stats)
+    requests_made = stats["requests"] or 1
+    stats["connection_reuse_ratio"] = round(1 - stats["connections_opened"] / requests_made, 3)
+    stats["avg_connect_ms"] = round(
+        1000 * stats["connect_seconds"] / max(stats["connections_opened"], 1), 2
+    )
+    stats["handshake_share"] = round(
+        stats["connect_seconds"] / stats["request_seconds"], 3
+    ) if stats["request_seconds"] else 0.0
+    return stats
@@ -1,16 +1,60 @@
 import os
 import re
+import asyncio
 import logging
-import requests
-from helpers.token_helpers import count_tokens
+from urllib.parse import quote
+from helpers.github_cache import start_request_stats
+from helpers.github_client import github_get, get_pool_stats
+from helpers.summarizers import summarize_file
+from helpers.context_helpers import RepoContext, make_section
+from helpers.executor import run_blocking
+from helpers.result_cache import result_cache
+from helpers.storage import get_storage
 from models import DevContainer
-from supabase_client import supabase
+
+IMPORTANT_FILES = [
+    "requirements.txt", "Dockerfile", ".gitignore", "package.json",
+    "Gemfile", "README.md", ".env.example", "Pipfile", "setup.py",
+    "Pipfile.lock", "pyproject.toml", "CMakeLists.txt", "Makefile",
+    "go.mod", "go.sum", "pom.xml", "build.gradle", "Cargo.toml",
+    "Cargo.lock", "composer.json", "phpunit.xml", "mix.exs",
+    "pubspec.yaml", "stack.yaml", "DESCRIPTION", "NAMESPACE", "Rakefile",
+]
+LARGE_DIRS_TO_SKIP = ["node_modules", "vendor"]
+
+def build_file_section(filename, content, report=None):
+    return make_section(f"Content of {filename}", summarize_file(filename, content, report))
+
+def normalize_repo_url(url):
+    """Canonical form of a repository URL, used to recognise the same repo."""
+    url = url.strip().rstrip("/")
+    url = re.sub(r"^http://", "https://", url)
+    url = re.sub(r"\.git$", "", url)
+    # GitHub owner and repository names are case-insensitive
+    return url.lower()
 
 def is_valid_github_url(url):
     pattern = r"^https?://github\.com/[\w-]+/[\w.-]+/?$"
     return re.match(pattern, url) is not None
 
-def fetch_repo_context(repo_url, max_depth=1):
+async def resolve_head_sha(repo_url):
+    """Resolve the default branch HEAD commit SHA with a single cheap API call."""
+    if not is_valid_github_url(repo_url):
+        return None
+    parts = repo_url.rstrip("/").split("/")
+    owner, repo = parts[-2], parts[-1]
+    headers = {
+        # The sha media type returns just the 40-character SHA as plain text.
+        "Accept": "application/vnd.github.sha",
+        "Authorization": f"token {os.getenv('GITHUB_TOKEN')}",
+    }
+    response = await github_get(f"https://api.github.com/repos/{owner}/{repo}/commits/HEAD", headers=headers)
+    if response.status_code != 200:
+        logging.warning(f"Could not resolve HEAD commit for {repo_url}: {response.status_code}")
+        return None
+    return response.text.strip()
+
+async def fetch_repo_context(repo_url, max_depth=None, traversal=None, ref="HEAD"):
     # First, check if the URL is valid
     if not is_valid_github_url(repo_url):
         logging.error(f"Invalid GitHub repository URL: {repo_url}")
@@ -18,133 +62,225 @@ def fetch_repo_context(repo_url, max_depth=1):
 
     logging.info(f"Fetching context from GitHub repository: {repo_url}")
     token = os.getenv("GITHUB_TOKEN")
+    if max_depth is None:
+        max_depth = int(os.getenv("GITHUB_MAX_DEPTH", 1))
+    if traversal is None:
+        # "tree" reads the whole listing with one Git Trees API call,
+        # "contents" walks the Contents API one directory at a time.
+        traversal = os.getenv("GITHUB_TRAVERSAL", "tree")
 
     parts = repo_url.split("/")
     owner = parts[-2]
     repo = parts[-1]
 
     contents_api_url = f"https://api.github.com/repos/{owner}/{repo}/contents"
+    trees_api_url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{ref}"
+    raw_base_url = f"https://raw.githubusercontent.com/{owner}/{repo}/{ref}"
     languages_api_url = f"https://api.github.com/repos/{owner}/{repo}/languages"
 
     headers = {
         "Accept": "application/vnd.github.v3+json",
         "Authorization": f"token {token}",
     }
+    # The Contents API reads the default branch unless told otherwise; pin it
+    # to the same commit as the tree and raw downloads.
+    ref_params = None if ref == "HEAD" else {"ref": ref}
+
+    request_cache_stats = start_request_stats()
+    # Estimated tokens saved per summarizer stage across this repository's files
+    summary_report = {}
 
-    existing_devcontainer = None
-    devcontainer_url = None
+    # Every GitHub round-trip below goes through this semaphore, so directory
+    # listings, file downloads and the languages lookup overlap without
+    # flooding the API.
+    semaphore = asyncio.Semaphore(int(os.getenv("GITHUB_MAX_CONCURRENCY", 8)))
 
-    root_devcontainer_url = f"{contents_api_url}/.devcontainer.json"
-    response = requests.get(root_devcontainer_url, headers=headers)
-    if response.status_code == 200:
-        existing_devcontainer = requests.get(response.json()["download_url"]).text
-        devcontainer_url = response.json()["download_url"]
+    async def get(url, **kwargs):
+        async with semaphore:
+            return await github_get(url, **kwargs)
 
-    if not existing_devcontainer:
-        devcontainer_dir_url = f"{contents_api_url}/.devcontainer"
-        response = requests.get(devcontainer_dir_url, headers=headers)
-        if response.status_code == 200:
-            for item in response.json():
+    async def fetch_text(url):
+        response = await get(url)
+        return response.text
+
+    async def fetch_existing_devcontainer():
+        root_response, dir_response = await asyncio.gather(
+            get(f"{contents_api_url}/.devcontainer.json", params=ref_params, headers=headers),
+            get(f"{contents_api_url}/.devcontainer", params=ref_params, headers=headers),
+        )
+        if root_response.status_code == 200:
+            download_url = root_response.json()["download_url"]
+            existing = await fetch_text(download_url)
+            if existing:
+                return existing, download_url
+
+        if dir_response.status_code == 200:
+            for item in dir_response.json():
                 if item["name"] == "devcontainer.json":
-                    existing_devcontainer = requests.get(item["download_url"]).text
-                    devcontainer_url = item["download_url"]
-                    break
+                    return await fetch_text(item["download_url"]), item["download_url"]
+        return None, None
 
-    context = []
-    total_tokens = 0
+    async def fetch_file_section(item):
+        file_content = await fetch_text(item["download_url"])
+        # Summarizing and tokenizing are CPU-bound; keep them off the loop
+        file_report = {}
+        section = await run_blocking(build_file_section, item["name"], file_content, file_report)
+        for stage, saved in file_report.items():
+            summary_report[stage] = summary_report.get(stage, 0) + saved
+        return section
 
-    def traverse_dir(api_url, depth=0, prefix=""):
+    async def traverse_dir(api_url, depth=0, prefix=""):
+        # Returns (structure lines, file sections) in the same depth-first
+        # order the sequential walker produced them.
         if depth > max_depth:
-            return []
+            return [], []
 
-        logging.info(f"Traversing directory: {api_url}")
-        response = requests.get(api_url, headers=headers)
+        response = await get(api_url, params=ref_params, headers=headers)
         response.raise_for_status()
+        items = response.json()
+
+        subdirs = []
+        files = []
+        for item in items:
+            if item["type"] == "dir" and item["name"] not in LARGE_DIRS_TO_SKIP:
+                subdirs.append(traverse_dir(item["url"], depth + 1, prefix=prefix + "    "))
+            if item["type"] == "file" and item["name"] in IMPORTANT_FILES:
+                files.append(fetch_file_section(item))
+
+        subdir_results, file_sections = await asyncio.gather(
+            asyncio.gather(*subdirs), asyncio.gather(*files)
+        )
+        subdir_results = iter(subdir_results)
+        file_sections = iter(file_sections)
 
         structure = []
-        important_files = [
-            "requirements.txt", "Dockerfile", ".gitignore", "package.json",
-            "Gemfile", "README.md", ".env.example", "Pipfile", "setup.py",
-            "Pipfile.lock", "pyproject.toml", "CMakeLists.txt", "Makefile",
-            "go.mod", "go.sum", "pom.xml", "build.gradle", "Cargo.toml",
-            "Cargo.lock", "composer.json", "phpunit.xml", "mix.exs",
-            "pubspec.yaml", "stack.yaml", "DESCRIPTION", "NAMESPACE", "Rakefile",
-        ]
-        large_dirs_to_skip = ["node_modules", "vendor"]
-
-        for item in response.json():
-            logging.debug(f"Processing item: {item['name']}")
+        sections = []
+        for item in items:
             if item["type"] == "dir":
-                if item["name"] in large_dirs_to_skip:
+                if item["name"] in LARGE_DIRS_TO_SKIP:
                     continue
+                sub_structure, sub_sections = next(subdir_results)
                 structure.append(f"{prefix}{item['name']}/")
-                structure.extend(
-                    traverse_dir(item["url"], depth + 1, prefix=prefix + "    ")
-                )
+                structure.extend(sub_structure)
+                sections.extend(sub_sections)
             else:
                 structure.append(f"{prefix}{item['name']}")
 
-            if item["type"] == "file" and item["name"] in important_files:
-                logging.debug(f"Fetching content of {item['name']}")
-                file_content = requests.get(item["download_url"]).text
-                content_text = (
-                    f"<<SECTION: Content of {item['name']} >>\n{file_content}"
-                    + f"\n<<END_SECTION: Content of {item['name']} >>"
-                )
-                context.append(content_text)
+            if item["type"] == "file" and item["name"] in IMPORTANT_FILES:
+                sections.append(next(file_sections))
 
-                file_tokens = count_tokens(content_text)
-                nonlocal total_tokens
-                total_tokens += file_tokens
+        return structure, sections
 
-        return structure
+    async def traverse_tree():
+        # Builds the same listing as traverse_dir from a single recursive
+        # Git Trees API call. Returns None when the tree cannot be used
+        # (missing ref, or a truncated response on very large repos) so
+        # the caller can fall back to the Contents API walker.
+        logging.info(f"Fetching repository tree: {trees_api_url}")
+        response = await get(trees_api_url, params={"recursive": 1}, headers=headers)
+        if response.status_code != 200:
+            logging.warning(f"Tree request failed with status {response.status_code}, falling back to contents traversal")
+            return None
+        tree = response.json()
+        if tree.get("truncated"):
+            logging.warning("Repository tree is truncated, falling back to contents traversal")
+            return None
 
-    logging.info("Building repository structure...")
-    repo_structure = traverse_dir(contents_api_url)
+        blob_paths = set()
+        structure = []
+        files = []
+        for entry in tree["tree"]:
+            path_parts = entry["path"].split("/")
+            name = path_parts[-1]
+            depth = len(path_parts) - 1
+            if entry["type"] == "blob":
+                blob_paths.add(entry["path"])
+            if depth > max_depth:
+                continue
+            skipped_parts = path_parts if entry["type"] == "tree" else path_parts[:-1]
+            if any(part in LARGE_DIRS_TO_SKIP for part in skipped_parts):
+                continue
 
-    logging.info("Adding repository structure to context...")
-    repo_structure_text = (
-        "<<SECTION: Repository Structure >>\n"
-        + "\n".join(repo_structure)
-        + "\n<<END_SECTION: Repository Structure >>"
-    )
-    context.insert(0, repo_structure_text)
+            prefix = "    " * depth
+            if entry["type"] == "tree":
+                structure.append(f"{prefix}{name}/")
+            else:
+                structure.append(f"{prefix}{name}")
 
-    repo_structure_tokens = count_tokens(repo_structure_text)
-    total_tokens += repo_structure_tokens
+            if entry["type"] == "blob" and name in IMPORTANT_FILES:
+                files.append({"name": name, "download_url": f"{raw_base_url}/{quote(entry['path'])}"})
 
-    logging.info("Fetching repository languages...")
-    languages_response = requests.get(languages_api_url, headers=headers)
-    languages_response.raise_for_status()
+        async def fetch_tree_devcontainer():
+            for path in (".devcontainer.json", ".devcontainer/devcontainer.json"):
+                if path in blob_paths:
+                    download_url = f"{raw_base_url}/{path}"
+                    existing = await fetch_text(download_url)
+                    if existing:
+                        return existing, download_url
+            return None, None
 
-    logging.info("Adding repository languages to context...")
-    languages_data = languages_response.json()
-    languages_context = (
-        "<<SECTION: Repository Languages >>\n"
-        + "\n".join(
-            [f"{lang}: {count} lines" for lang, count in languages_data.items()]
+        existing, sections = await asyncio.gather(
+            fetch_tree_devcontainer(),
+            asyncio.gather(*[fetch_file_section(item) for item in files]),
         )
-        + "\n<<END_SECTION: Repository Languages >>"
+        return existing, (structure, list(sections))
+
+    async def fetch_languages():
+        logging.info("Fetching repository languages...")
+        response = await get(languages_api_url, headers=headers)
+        response.raise_for_status()
+        return response.json()
+
+    async def walk_repository():
+        walked = None
+        if traversal == "tree":
+            walked = await traverse_tree()
+        if walked is None:
+            walked = await asyncio.gather(
+                fetch_existing_devcontainer(),
+                traverse_dir(contents_api_url),
+            )
+        return walked
+
+    logging.info("Building repository structure...")
+    (
+        ((existing_devcontainer, devcontainer_url), (repo_structure, context)),
+        languages_data,
+    ) = await asyncio.gather(walk_repository(), fetch_languages())
+    logging.info(f"GitHub connection pool stats: {get_pool_stats()}")
+    logging.info(
+        f"GitHub cache for {repo_url}: hits={request_cache_stats['hits']} "
+        f"misses={request_cache_stats['misses']} not_modified={request_cache_stats['not_modified']}"
     )
-    context.append(languages_context)
 
-    languages_tokens = count_tokens(languages_context)
-    total_tokens += languages_tokens
+    logging.info("Adding repository structure to context...")
+    context.insert(0, make_section("Repository Structure", "\n".join(repo_structure)))
 
-    logging.debug(f"Total tokens: {total_tokens}")
+    logging.info("Adding repository languages to context...")
+    context.append(make_section(
+        "Repository Languages",
+        "\n".join([f"{lang}: {count} lines" for lang, count in languages_data.items()]),
+    ))
 
     if existing_devcontainer:
-        devcontainer_context = (
-            "<<SECTION: Existing devcontainer.json >>\n"
-            f"{existing_devcontainer}\n"
-            "<<END_SECTION: Existing devcontainer.json >>"
-        )
-        context.append(devcontainer_context)
-        total_tokens += count_tokens(devcontainer_context)
+        context.append(make_section("Existing devcontainer.json", existing_devcontainer))
+
+    repo_context = RepoContext(sections=context)
+    logging.debug(f"Total tokens: {repo_context.tokens}")
+    if summary_report:
+        logging.info(f"Summarization saved about {sum(summary_report.values())} tokens: {summary_report}")
+
+    return repo_context, existing_devcontainer, devcontainer_url
 
-    return "\n\n".join(context), existing_devcontainer, devcontainer_url
+def check_url_exists(url, use_cache=True):
+    if use_cache:
+        cached = result_cache.get(url)
+        if cached is not None:
+            return True, cached
+    existing_record = get_storage().latest_record(url)
+    if existing_record is not None:
+        result_cache.set(url, existing_record)
+    return existing_record is not None, existing_record
 
-def check_url_exists(url):
-    existing = supabase.table("devcontainers").select("*").eq("url", url).order("created_at", desc=True).limit(1).execute()
-    existing_record = existing.data[0] if existing.data else None
-    return existing_record is not None, existing_record
\ No newline at end of file
+def fetch_stored_context(url, commit_sha):
+    return get_storage().stored_context(url, commit_sha)
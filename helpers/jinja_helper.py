@@ -1,11 +1,53 @@
+import logging
+import os
+import time
 from typing import Any
 
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
 
+PROJECT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
 
-def process_template(template_file: str, data: dict[str, Any]) -> str:
-    jinja_env = Environment(
-        loader=FileSystemLoader(searchpath="./"), autoescape=select_autoescape()
-    )
-    template = jinja_env.get_template(template_file)
-    return template.render(**data)
\ No newline at end of file
+# Prompt templates compiled when the module is imported, so the first
+# generation does not pay for reading and compiling them.
+PROMPT_TEMPLATES = ["prompts/devcontainer_system.jinja", "prompts/devcontainer.jinja", "prompts/repair.jinja"]
+
+# Running totals of prompt rendering, like encode_stats in token_helpers.
+render_stats = {"renders": 0, "seconds": 0.0}
+
+
+def _bytecode_cache():
+    # Compiled templates survive restarts; JINJA_CACHE_DIR defaults to the
+    # system temp directory.
+    cache_dir = os.getenv("JINJA_CACHE_DIR")
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    return FileSystemBytecodeCache(cache_dir)
+
+
+# One environment for the process: templates are loaded and compiled once and
+# only re-read if the file changes on disk.
+jinja_env = Environment(
+    loader=FileSystemLoader(searchpath=PROJECT_ROOT),
+    autoescape=select_autoescape(),
+    bytecode_cache=_bytecode_cache(),
+)
+
+
+def precompile_templates(names=PROMPT_TEMPLATES):
+    for name in names:
+        jinja_env.get_template(name)
+
+
+def render_template(template_file: str, **data: Any) -> str:
+    start = time.perf_counter()
+    # Jinja collects the output pieces, including large variables such as
+    # repo_context, by reference and joins them once.
+    rendered = jinja_env.get_template(template_file).render(**data)
+    elapsed = time.perf_counter() - start
+    render_stats["renders"] += 1
+    render_stats["seconds"] += elapsed
+    logging.debug(f"Rendered {template_file} ({len(rendered)} chars) in {1000 * elapsed:.2f} ms")
+    return rendered
+
+
+precompile_templates()
@@ -0,0 +1,190 @@
+import contextvars
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Upper bounds in seconds; they span sub-millisecond cache reads up to
+# multi-minute LLM calls.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_lock = threading.Lock()
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram keyed by a tuple of label values."""
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, value, *labels):
+        with _lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with _lock:
+            series = {labels: {**values, "buckets": list(values["buckets"])} for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            base = [f'{name}="{value}"' for name, value in zip(self.label_names, labels)]
+            for bound, count in zip(self.buckets, values["buckets"]):
+                bucket_labels = ",".join(base + [f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {count}")
+            bucket_labels = ",".join(base + ['le="+Inf"'])
+            lines.append(f"{self.name}_bucket{{{bucket_labels}}} {values['count']}")
+            suffix = "{" + ",".join(base) + "}" if base else ""
+            lines.append(f"{self.name}_sum{suffix} {values['sum']}")
+            lines.append(f"{self.name}_count{suffix} {values['count']}")
+        return "\n".join(lines)
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+
+    def inc(self, amount=1, *labels):
+        with _lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with _lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            base = ",".join(f'{name}="{label}"' for name, label in zip(self.label_names, labels))
+            lines.append(f"{self.name}{{{base}}} {value}" if base else f"{self.name} {value}")
+        return "\n".join(lines)
+
+
+stage_seconds = Histogram(
+    "devcontainer_stage_seconds", "Time spent in each generation pipeline stage.", ("stage",)
+)
+github_requests_per_generation = Histogram(
+    "devcontainer_github_requests_per_generation", "GitHub API calls made by one generation.",
+    buckets=COUNT_BUCKETS,
+)
+llm_tokens = Counter(
+    "devcontainer_llm_tokens_total",
+    "LLM tokens by direction (prompt, completion, and cached_prompt for prompt tokens served from the provider's cache).",
+    ("direction",),
+)
+generations = Counter(
+    "devcontainer_generations_total", "Finished generations by result source (error for failed ones).", ("source",)
+)
+llm_attempts = Counter(
+    "devcontainer_llm_attempts_total", "LLM attempts by model and outcome (valid, invalid, error).", ("model", "outcome")
+)
+
+METRICS = [stage_seconds, github_requests_per_generation, llm_tokens, generations, llm_attempts]
+
+# The current request's trace: an id for its log lines, per-stage totals,
+# GitHub call count and LLM tokens. Tasks started by the request inherit it.
+_trace = contextvars.ContextVar("devcontainer_trace", default=None)
+
+
+def start_trace(trace_id=None):
+    trace = {
+        "id": trace_id or uuid.uuid4().hex[:16],
+        "stages": {},
+        "github_requests": 0,
+        "prompt_tokens": 0,
+        "cached_prompt_tokens": 0,
+        "completion_tokens": 0,
+    }
+    _trace.set(trace)
+    return trace
+
+
+def record_stage(stage, seconds):
+    stage_seconds.observe(seconds, stage)
+    trace = _trace.get()
+    if trace is not None:
+        with _lock:
+            trace["stages"][stage] = trace["stages"].get(stage, 0.0) + seconds
+
+
+@contextmanager
+def span(stage):
+    """Time the enclosed block as one observation of stage (works in async code too)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def count_github_request():
+    trace = _trace.get()
+    if trace is not None:
+        with _lock:
+            trace["github_requests"] += 1
+
+
+def record_tokens(prompt_tokens=None, completion_tokens=None, cached_prompt_tokens=None):
+    if prompt_tokens:
+        llm_tokens.inc(prompt_tokens, "prompt")
+    if cached_prompt_tokens:
+        llm_tokens.inc(cached_prompt_tokens, "cached_prompt")
+    if completion_tokens:
+        llm_tokens.inc(completion_tokens, "completion")
+    trace = _trace.get()
+    if trace is not None:
+        with _lock:
+            trace["prompt_tokens"] += prompt_tokens or 0
+            trace["cached_prompt_tokens"] += cached_prompt_tokens or 0
+            trace["completion_tokens"] += completion_tokens or 0
+
+
+def record_llm_attempt(model, outcome):
+    llm_attempts.inc(1, model, outcome)
+
+
+def record_usage(response):
+    """Count tokens from the usage instructor attaches to non-streamed responses."""
+    usage = getattr(getattr(response, "_raw_response", None), "usage", None)
+    if usage is not None:
+        record_tokens(usage.prompt_tokens, usage.completion_tokens, cached_tokens(usage))
+    return usage
+
+
+def cached_tokens(usage):
+    """Prompt tokens the provider served from its prompt cache (0 if not reported)."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    if isinstance(details, dict):
+        return details.get("cached_tokens") or 0
+    return getattr(details, "cached_tokens", None) or 0
+
+
+def finish_trace(source):
+    """Record the request's totals and log one line with its stage timings."""
+    trace = _trace.get()
+    generations.inc(1, source)
+    if trace is None:
+        return
+    github_requests_per_generation.observe(trace["github_requests"])
+    stages = " ".join(f"{stage}={1000 * seconds:.1f}ms" for stage, seconds in trace["stages"].items())
+    logging.info(
+        f"trace={trace['id']} source={source} github_requests={trace['github_requests']} "
+        f"prompt_tokens={trace['prompt_tokens']} cached_prompt_tokens={trace['cached_prompt_tokens']} "
+        f"completion_tokens={trace['completion_tokens']} {stages}"
+    )
+
+
+def render_metrics():
+    return "\n".join(metric.render() for metric in METRICS) + "\n"
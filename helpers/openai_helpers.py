@@ -1,6 +1,6 @@
 import os
 import logging
-from openai import AzureOpenAI
+from openai import AsyncAzureOpenAI, AzureOpenAI
 import instructor
 
 def setup_azure_openai():
@@ -11,6 +11,29 @@ def setup_azure_openai():
         api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
     )
 
+def setup_async_azure_openai():
+    logging.info("Setting up async Azure OpenAI client...")
+    return AsyncAzureOpenAI(
+        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+    )
+
+def choose_model(context_tokens):
+    """Deployment for the first attempt at a context of context_tokens.
+
+    Contexts up to SMALL_MODEL_MAX_TOKENS go to SMALL_MODEL, a faster and
+    cheaper deployment, when one is configured; everything else goes to MODEL.
+    """
+    small_model = os.getenv("SMALL_MODEL")
+    if small_model and context_tokens <= int(os.getenv("SMALL_MODEL_MAX_TOKENS", 16000)):
+        return small_model
+    return os.getenv("MODEL")
+
+def escalation_model():
+    """Deployment for attempts after a failed one."""
+    return os.getenv("MODEL")
+
 def setup_instructor(openai_client):
     logging.info("Setting up Instructor client...")
     return instructor.patch(openai_client)
@@ -0,0 +1,110 @@
+import asyncio
+import inspect
+import logging
+import os
+from helpers.executor import run_blocking
+
+
+class PersistenceQueue:
+    """Batch embedding and database inserts in a background worker.
+
+    Requests hand finished rows to put() and return immediately. The worker
+    collects up to batch_size jobs (or whatever arrived within
+    flush_interval), embeds their contexts in a single call, inserts the rows
+    in a single call, and retries each step with exponential backoff. A batch
+    whose embedding keeps failing is still inserted, without embeddings.
+
+    embed_batch(texts) -> list of vectors and insert_batch(rows) may be
+    coroutine functions or blocking callables; blocking ones run on the
+    shared bounded executor. Vectors are stored in the row's embedding_field.
+
+    on_persisted(rows, saved), if set, is called after every batch with
+    saved=False when the insert gave up and the rows were dropped.
+    """
+
+    def __init__(self, embed_batch, insert_batch, batch_size=None, flush_interval=None, max_retries=None,
+                 embedding_field="embedding"):
+        self.embed_batch = embed_batch
+        self.insert_batch = insert_batch
+        self.embedding_field = embedding_field
+        self.batch_size = batch_size or int(os.getenv("PERSIST_BATCH_SIZE", 16))
+        self.flush_interval = flush_interval or float(os.getenv("PERSIST_FLUSH_INTERVAL", 0.5))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("PERSIST_MAX_RETRIES", 3))
+        self.on_persisted = None
+        self._queue = None
+        self._worker = None
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._queue = self._queue or asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def put(self, row, embedding_input=None):
+        """Queue a row (a dict) and the text to embed into its embedding field."""
+        self._ensure_worker()
+        await self._queue.put((row, embedding_input))
+
+    async def drain(self):
+        """Wait until every queued job has been persisted."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def _run(self):
+        while True:
+            jobs = [await self._queue.get()]
+            deadline = asyncio.get_running_loop().time() + self.flush_interval
+            while len(jobs) < self.batch_size:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    jobs.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            saved = False
+            try:
+                await self._persist(jobs)
+                saved = True
+            except Exception as e:
+                logging.error(f"Dropping {len(jobs)} rows after persistence failure: {e}")
+            finally:
+                self._notify([row for row, _ in jobs], saved)
+                for _ in jobs:
+                    self._queue.task_done()
+
+    def _notify(self, rows, saved):
+        if self.on_persisted is None:
+            return
+        try:
+            self.on_persisted(rows, saved)
+        except Exception as e:
+            logging.error(f"on_persisted callback failed: {e}")
+
+    async def _retry(self, description, func, *args):
+        for attempt in range(self.max_retries + 1):
+            try:
+                if inspect.iscoroutinefunction(func):
+                    return await func(*args)
+                return await run_blocking(func, *args)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = 0.5 * (2 ** attempt)
+                logging.warning(f"{description} failed (attempt {attempt + 1}): {e}. Retrying in {delay}s")
+                await asyncio.sleep(delay)
+
+    async def _persist(self, jobs):
+        rows = [row for row, _ in jobs]
+        to_embed = [(row, text) for row, text in jobs if text]
+        if to_embed:
+            try:
+                embeddings = await self._retry(
+                    f"Embedding batch of {len(to_embed)}", self.embed_batch, [text for _, text in to_embed]
+                )
+                for (row, _), embedding in zip(to_embed, embeddings):
+                    row[self.embedding_field] = embedding
+            except Exception as e:
+                logging.error(f"Embedding failed for {len(to_embed)} rows, saving without embeddings: {e}")
+
+        await self._retry(f"Inserting batch of {len(rows)}", self.insert_batch, rows)
+        logging.info(f"Persisted {len(rows)} rows ({len(to_embed)} embedded)")
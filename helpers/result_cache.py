@@ -0,0 +1,89 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class ResultCache:
+    """Bounded LRU of recent devcontainer records with a per-entry TTL.
+
+    When REDIS_URL is set (and the redis package is installed) entries are
+    also written to Redis, so several app processes share hits and
+    invalidations; the in-process LRU stays in front of it.
+    """
+
+    def __init__(self, max_entries, ttl, redis_url=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+        if redis_url and redis is not None:
+            self._redis = redis.Redis.from_url(redis_url)
+        elif redis_url:
+            logging.warning("REDIS_URL is set but the redis package is not installed; using the in-process cache only")
+
+    def _redis_key(self, key):
+        return f"devcontainer:result:{key}"
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if time.monotonic() < expires_at:
+                    self._entries.move_to_end(key)
+                    return value
+                del self._entries[key]
+
+        if self._redis is not None:
+            try:
+                cached = self._redis.get(self._redis_key(key))
+            except Exception as e:
+                logging.warning(f"Redis result cache read failed: {e}")
+                return None
+            if cached is not None:
+                value = json.loads(cached)
+                self._store(key, value)
+                return value
+        return None
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        self._store(key, value)
+        if self._redis is not None:
+            try:
+                self._redis.set(self._redis_key(key), json.dumps(value), ex=max(1, int(self.ttl)))
+            except Exception as e:
+                logging.warning(f"Redis result cache write failed: {e}")
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+        if self._redis is not None:
+            try:
+                self._redis.delete(self._redis_key(key))
+            except Exception as e:
+                logging.warning(f"Redis result cache invalidation failed: {e}")
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+result_cache = ResultCache(
+    max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 1024)),
+    ttl=float(os.getenv("RESULT_CACHE_TTL", 300)),
+    redis_url=os.getenv("REDIS_URL"),
+)
@@ -0,0 +1,44 @@
+import asyncio
+import logging
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one execution.
+
+    The first caller for a key starts func(broadcast); callers arriving while
+    it runs await the same task instead of starting their own. broadcast
+    fans progress events out to every caller's listener, and late joiners are
+    replayed the latest event of each kind so they start from the current
+    stage. The shared task is shielded, so one caller disconnecting does not
+    cancel the work for the others.
+    """
+
+    def __init__(self):
+        self._flights = {}
+
+    async def do(self, key, func, listener=None):
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = {"listeners": [], "last_events": {}}
+
+            async def broadcast(event, data):
+                flight["last_events"][event] = data
+                for subscriber in list(flight["listeners"]):
+                    await subscriber(event, data)
+
+            flight["task"] = asyncio.ensure_future(func(broadcast))
+            flight["task"].add_done_callback(lambda _: self._flights.pop(key, None))
+            self._flights[key] = flight
+        else:
+            logging.info(f"Joining in-flight generation for {key}")
+            if listener is not None:
+                for event, data in flight["last_events"].items():
+                    await listener(event, data)
+
+        if listener is not None:
+            flight["listeners"].append(listener)
+        try:
+            return await asyncio.shield(flight["task"])
+        finally:
+            if listener is not None and listener in flight["listeners"]:
+                flight["listeners"].remove(listener)
@@ -0,0 +1,224 @@
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from helpers.context_helpers import context_hash
+
+# Columns needed to answer /generate from an existing record. repo_context and
+# embedding are large and only fetched when actually used.
+RECORD_COLUMNS = ["id", "url", "devcontainer_json", "devcontainer_url", "generated", "commit_sha", "created_at"]
+INDEX_COLUMNS = ["id", "url", "devcontainer_json", "embedding", "embedding_blob"]
+
+
+def split_contexts(rows):
+    """Copy rows, replacing repo_context with context_hash; return (rows, contexts).
+
+    Contexts are stored once in the content-addressed repo_contexts table, so
+    regenerates and unchanged repositories do not store another copy. Rows are
+    copied so a retried batch still carries its contexts.
+    """
+    rows = [dict(row) for row in rows]
+    contexts = {}
+    for row in rows:
+        text = row.pop("repo_context", None)
+        if text is not None:
+            row["context_hash"] = context_hash(text)
+            contexts[row["context_hash"]] = {"hash": row["context_hash"], "content": text, "tokens": row.get("tokens")}
+    return rows, list(contexts.values())
+
+
+class SupabaseStorage:
+    """Records in the Supabase devcontainers and repo_contexts tables, via PostgREST."""
+
+    def __init__(self):
+        from supabase_client import supabase
+        self.client = supabase
+
+    def latest_record(self, url):
+        existing = (
+            self.client.table("devcontainers").select(", ".join(RECORD_COLUMNS))
+            .eq("url", url).order("created_at", desc=True).limit(1).execute()
+        )
+        return existing.data[0] if existing.data else None
+
+    def stored_context(self, url, commit_sha):
+        stored = (
+            self.client.table("devcontainers").select("repo_context, context_hash")
+            .eq("url", url).eq("commit_sha", commit_sha).order("created_at", desc=True).limit(1).execute()
+        )
+        if not stored.data:
+            return None
+        record = stored.data[0]
+        if record.get("context_hash"):
+            context = self.client.table("repo_contexts").select("content").eq("hash", record["context_hash"]).execute()
+            return context.data[0]["content"] if context.data else None
+        # Rows written before the repo_contexts table keep the text inline
+        return record.get("repo_context")
+
+    def insert_devcontainers(self, rows):
+        rows, contexts = split_contexts(rows)
+        if contexts:
+            self.client.table("repo_contexts").upsert(contexts, on_conflict="hash", ignore_duplicates=True).execute()
+        result = self.client.table("devcontainers").insert(rows).execute()
+        return result.data or rows
+
+    def embedding_rows(self, after_id, limit):
+        page = (
+            self.client.table("devcontainers").select(", ".join(INDEX_COLUMNS))
+            .or_("embedding_blob.not.is.null,embedding.not.is.null")
+            .gt("id", after_id).order("id").limit(limit).execute()
+        )
+        return page.data or []
+
+
+SQLITE_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS devcontainers (
+  id INTEGER NOT NULL,
+  url VARCHAR,
+  devcontainer_json TEXT,
+  devcontainer_url VARCHAR,
+  repo_context TEXT,
+  tokens INTEGER,
+  model TEXT,
+  embedding TEXT,
+  generated BOOLEAN,
+  created_at DATETIME,
+  PRIMARY KEY (id)
+);
+CREATE TABLE IF NOT EXISTS repo_contexts (
+  hash TEXT PRIMARY KEY,
+  content TEXT NOT NULL,
+  tokens INTEGER,
+  created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+# Columns added to devcontainers since data/devcontainers.db was first shipped
+SQLITE_ADDED_COLUMNS = {
+    "commit_sha": "VARCHAR", "embedding_blob": "BLOB", "context_hash": "TEXT", "generation_ms": "INTEGER",
+}
+
+SQLITE_INDEX_SQL = """
+CREATE INDEX IF NOT EXISTS ix_devcontainers_url_created_at ON devcontainers (url, created_at DESC);
+CREATE INDEX IF NOT EXISTS ix_devcontainers_url_commit_sha ON devcontainers (url, commit_sha);
+"""
+
+LATEST_RECORD_SQL = (
+    f"SELECT {', '.join(RECORD_COLUMNS)} FROM devcontainers WHERE url = ? ORDER BY created_at DESC LIMIT 1"
+)
+STORED_CONTEXT_SQL = (
+    "SELECT COALESCE(c.content, d.repo_context) FROM devcontainers d "
+    "LEFT JOIN repo_contexts c ON c.hash = d.context_hash "
+    "WHERE d.url = ? AND d.commit_sha = ? ORDER BY d.created_at DESC LIMIT 1"
+)
+INSERT_CONTEXT_SQL = "INSERT OR IGNORE INTO repo_contexts (hash, content, tokens) VALUES (:hash, :content, :tokens)"
+EMBEDDING_ROWS_SQL = (
+    f"SELECT {', '.join(INDEX_COLUMNS)} FROM devcontainers "
+    "WHERE (embedding_blob IS NOT NULL OR embedding IS NOT NULL) AND id > ? ORDER BY id LIMIT ?"
+)
+
+
+class SQLiteStorage:
+    """Records in a local SQLite database, for offline use and sub-millisecond lookups.
+
+    Connections come from a fixed-size pool; each runs in WAL mode, so reads
+    never wait on the writer, and keeps its own prepared-statement cache for
+    the fixed queries above.
+    """
+
+    def __init__(self, path, pool_size=4):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._pool = queue.Queue()
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        self._write_lock = threading.Lock()
+        with self._connection() as conn:
+            conn.executescript(SQLITE_SCHEMA_SQL)
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(devcontainers)")}
+            for column, column_type in SQLITE_ADDED_COLUMNS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE devcontainers ADD COLUMN {column} {column_type}")
+            conn.executescript(SQLITE_INDEX_SQL)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=64, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def latest_record(self, url):
+        with self._connection() as conn:
+            row = conn.execute(LATEST_RECORD_SQL, (url,)).fetchone()
+        if row is None:
+            return None
+        record = dict(row)
+        record["generated"] = bool(record["generated"])
+        return record
+
+    def stored_context(self, url, commit_sha):
+        with self._connection() as conn:
+            row = conn.execute(STORED_CONTEXT_SQL, (url, commit_sha)).fetchone()
+        return row[0] if row else None
+
+    def insert_devcontainers(self, rows):
+        rows, contexts = split_contexts(rows)
+        inserted = []
+        with self._write_lock, self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(INSERT_CONTEXT_SQL, contexts)
+                for row in rows:
+                    row = {key: value for key, value in row.items() if value is not None or key != "id"}
+                    blob = row.get("embedding_blob")
+                    if isinstance(blob, str) and blob.startswith("\\x"):
+                        row["embedding_blob"] = bytes.fromhex(blob[2:])
+                    columns = ", ".join(row)
+                    placeholders = ", ".join(f":{key}" for key in row)
+                    cursor = conn.execute(f"INSERT INTO devcontainers ({columns}) VALUES ({placeholders})", row)
+                    inserted.append({**row, "id": cursor.lastrowid})
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return inserted
+
+    def embedding_rows(self, after_id, limit):
+        with self._connection() as conn:
+            return [dict(row) for row in conn.execute(EMBEDDING_ROWS_SQL, (after_id, limit))]
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """Return the configured backend: STORAGE_BACKEND=supabase (default) or sqlite."""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            backend = os.getenv("STORAGE_BACKEND", "supabase").lower()
+            if backend == "sqlite":
+                _storage = SQLiteStorage(
+                    os.getenv("SQLITE_PATH", "data/local.db"),
+                    pool_size=int(os.getenv("SQLITE_POOL_SIZE", 4)),
+                )
+            elif backend == "supabase":
+                _storage = SupabaseStorage()
+            else:
+                raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}, expected supabase or sqlite")
+            logging.info(f"Using {backend} storage backend")
+    return _storage
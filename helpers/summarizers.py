@@ -0,0 +1,178 @@
+import json
+import logging
+import os
+import re
+from helpers.token_helpers import encode, get_encoding
+
+# Filename -> summarizer. Register new file types with @summarizer("name").
+SUMMARIZERS = {}
+
+README_SETUP_KEYWORDS = [
+    "install", "setup", "set up", "getting started", "quick start", "quickstart",
+    "requirement", "prerequisite", "build", "development", "develop", "usage",
+    "running", "run ", "test", "configuration", "environment", "docker", "dependencies",
+]
+README_PREAMBLE_LINES = 20
+# Rough bytes per token for English text and code. Savings are estimated from
+# byte counts so reporting them never costs a tokenizer pass.
+BYTES_PER_TOKEN = 4
+
+def summarizer(*filenames):
+    def register(func):
+        for filename in filenames:
+            SUMMARIZERS[filename] = func
+        return func
+    return register
+
+@summarizer("Pipfile.lock")
+def summarize_pipfile_lock(content):
+    lock = json.loads(content)
+    lines = ["# Summary of Pipfile.lock (hashes and markers omitted)"]
+    requires = lock.get("_meta", {}).get("requires", {})
+    for key, value in requires.items():
+        lines.append(f"{key}: {value}")
+    for group in ("default", "develop"):
+        packages = lock.get(group, {})
+        lines.append(f"[{group}] {len(packages)} packages")
+        for name, spec in sorted(packages.items()):
+            lines.append(f"{name}{spec.get('version', '')}")
+    return "\n".join(lines)
+
+def _parse_cargo_packages(content):
+    packages = []
+    current = None
+    for line in content.splitlines():
+        line = line.strip()
+        if line == "[[package]]":
+            current = {"dependencies": []}
+            packages.append(current)
+        elif current is not None and line.startswith(("name =", "version =", "source =")):
+            key, _, value = line.partition("=")
+            current[key.strip()] = value.strip().strip('"')
+        elif current is not None and line.startswith('"') and "dependencies" in current:
+            current["dependencies"].append(line.strip('",').split(" ")[0])
+        elif line.startswith("["):
+            current = None
+    return packages
+
+@summarizer("Cargo.lock")
+def summarize_cargo_lock(content):
+    packages = _parse_cargo_packages(content)
+    versions = {package.get("name"): package.get("version") for package in packages}
+    # Packages without a source are the workspace's own crates; their
+    # dependency lists are the direct dependencies.
+    roots = [package for package in packages if "source" not in package]
+    direct = sorted({dep for package in roots for dep in package["dependencies"]})
+    lock_version = re.search(r"^version = (\d+)", content, re.MULTILINE)
+
+    lines = ["# Summary of Cargo.lock (transitive dependencies omitted)"]
+    if lock_version:
+        lines.append(f"lockfile version: {lock_version.group(1)}")
+    lines.append(f"total packages: {len(packages)}")
+    for package in roots:
+        lines.append(f"workspace crate: {package.get('name')} {package.get('version')}")
+    lines.append("direct dependencies:")
+    lines.extend(f"{name} {versions.get(name, '')}".rstrip() for name in direct)
+    return "\n".join(lines)
+
+@summarizer("go.sum")
+def summarize_go_sum(content):
+    modules = {}
+    for line in content.splitlines():
+        parts = line.split()
+        if len(parts) < 2 or parts[1].endswith("/go.mod"):
+            continue
+        modules[parts[0]] = parts[1]
+    lines = [f"# Summary of go.sum: {len(modules)} modules (checksums omitted, see go.mod for direct requirements)"]
+    lines.extend(f"{module} {version}" for module, version in sorted(modules.items()))
+    return "\n".join(lines)
+
+def _markdown_sections(content):
+    """Split markdown into (heading, lines) blocks, ignoring # inside code fences."""
+    sections = [("", [])]
+    in_fence = False
+    for line in content.splitlines():
+        if line.lstrip().startswith("```"):
+            in_fence = not in_fence
+        if not in_fence and re.match(r"^#{1,6} ", line):
+            sections.append((line, [line]))
+        else:
+            sections[-1][1].append(line)
+    return sections
+
+@summarizer("README.md")
+def summarize_readme(content):
+    sections = _markdown_sections(content)
+    # The preamble and the first headed section usually hold the title and
+    # a one-paragraph description; keep their opening lines only.
+    kept = [lines[:README_PREAMBLE_LINES] for _, lines in sections[:2]]
+    for heading, lines in sections[2:]:
+        if any(keyword in heading.lower() for keyword in README_SETUP_KEYWORDS):
+            kept.append(lines)
+
+    summary = "\n".join(
+        line for lines in kept for line in lines
+        if not re.match(r"^\s*\[?!\[", line)  # badges and images
+    )
+    return summary if summary.strip() else content
+
+def _parse_caps(value):
+    caps = {}
+    for entry in (value or "").split(","):
+        filename, _, cap = entry.partition("=")
+        if cap.strip().isdigit():
+            caps[filename.strip()] = int(cap)
+    return caps
+
+def _cap_bytes(content, max_bytes):
+    data = content.encode("utf-8")
+    if len(data) <= max_bytes:
+        return content
+    cut = data[:max_bytes].decode("utf-8", errors="ignore")
+    return cut[:cut.rfind("\n")] if "\n" in cut else cut
+
+def _cap_tokens(content, max_tokens):
+    # Every token covers at least one byte, so this skips the encode for
+    # anything already under the cap.
+    if len(content.encode("utf-8")) <= max_tokens:
+        return content
+    tokens = encode(content)
+    if len(tokens) <= max_tokens:
+        return content
+    return get_encoding().decode(tokens[:max_tokens])
+
+def summarize_file(filename, content, report=None):
+    """Run the file through its summarizer and the configured size caps.
+
+    report, if given, is a dict of stage name -> estimated tokens saved that
+    this call adds to.
+    """
+    if os.getenv("SUMMARIZE_FILES", "true").lower() != "true":
+        return content
+
+    max_bytes = _parse_caps(os.getenv("SUMMARY_BYTE_CAPS")).get(
+        filename, int(os.getenv("SUMMARY_MAX_BYTES", 100_000))
+    )
+    max_tokens = _parse_caps(os.getenv("SUMMARY_TOKEN_CAPS")).get(
+        filename, int(os.getenv("SUMMARY_MAX_TOKENS", 20_000))
+    )
+
+    stages = []
+    if filename in SUMMARIZERS:
+        stages.append((SUMMARIZERS[filename].__name__, SUMMARIZERS[filename]))
+    stages.append(("byte_cap", lambda text: _cap_bytes(text, max_bytes)))
+    stages.append(("token_cap", lambda text: _cap_tokens(text, max_tokens)))
+
+    for name, stage in stages:
+        try:
+            summarized = stage(content)
+        except Exception as e:
+            logging.warning(f"Summarizer {name} failed for {filename}: {e}")
+            continue
+        if len(summarized) >= len(content):
+            continue
+        if report is not None:
+            saved_bytes = len(content.encode("utf-8")) - len(summarized.encode("utf-8"))
+            report[name] = report.get(name, 0) + saved_bytes // BYTES_PER_TOKEN
+        content = summarized
+    return content
@@ -1,14 +1,42 @@
+import time
+from functools import lru_cache
+
 import tiktoken
 
-def count_tokens(text):
-    encoder = tiktoken.encoding_for_model("gpt-4o")
-    tokens = encoder.encode(text)
-    return len(tokens)
+from helpers.metrics import record_stage
+
+DEFAULT_MODEL = "gpt-4o"
+
+# Running totals so callers (and benchmarks) can see how much encoding a
+# request actually did.
+encode_stats = {"calls": 0, "tokens": 0, "cpu_seconds": 0.0}
+
+@lru_cache(maxsize=None)
+def get_encoding(model_name=DEFAULT_MODEL):
+    return tiktoken.encoding_for_model(model_name)
+
+def encode(text, model_name=DEFAULT_MODEL):
+    # CPU time of this thread only; process_time would also count whatever
+    # other threads did meanwhile.
+    start = time.thread_time()
+    tokens = get_encoding(model_name).encode(text)
+    encode_stats["calls"] += 1
+    encode_stats["tokens"] += len(tokens)
+    elapsed = time.thread_time() - start
+    encode_stats["cpu_seconds"] += elapsed
+    record_stage("token_count", elapsed)
+    return tokens
+
+def count_tokens(text, model_name=DEFAULT_MODEL):
+    return len(encode(text, model_name))
 
 def truncate_to_token_limit(text, model_name, max_tokens):
-    encoding = tiktoken.encoding_for_model(model_name)
-    tokens = encoding.encode(text)
+    # Every token covers at least one byte, so short texts cannot exceed the
+    # limit and need no encode at all.
+    if len(text.encode("utf-8")) <= max_tokens:
+        return text
+    tokens = encode(text, model_name)
     if len(tokens) > max_tokens:
         truncated_tokens = tokens[:max_tokens]
-        return encoding.decode(truncated_tokens)
-    return text
\ No newline at end of file
+        return get_encoding(model_name).decode(truncated_tokens)
+    return text
@@ -0,0 +1,134 @@
+import copy
+import json
+import os
+from functools import lru_cache
+
+import jsonschema
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "..", "schemas", "devContainer.base.schema.json")
+
+# Keywords that only drive editor features (hover text, snippets, deprecation
+# hints); they add tokens to an LLM tool definition without constraining it.
+EDITOR_KEYWORDS = {
+    "default", "defaultSnippets", "deprecated", "deprecationMessage", "doNotSuggest",
+    "enumDescriptions", "errorMessage", "markdownDescription",
+}
+
+
+@lru_cache(maxsize=None)
+def load_schema():
+    with open(SCHEMA_PATH, "r") as schema_file:
+        return json.load(schema_file)
+
+
+@lru_cache(maxsize=None)
+def get_validator():
+    """Check and compile the devcontainer.json schema once.
+
+    jsonschema.validate() re-checks the schema against its metaschema and
+    builds a new validator on every call, which costs far more than the
+    validation itself.
+    """
+    schema = load_schema()
+    validator_class = jsonschema.validators.validator_for(schema)
+    validator_class.check_schema(schema)
+    return validator_class(schema)
+
+
+def schema_property(name):
+    """The schema's definition of a top-level devcontainer.json property, minus editor-only keywords."""
+    for definition in load_schema()["definitions"].values():
+        if name in definition.get("properties", {}):
+            return _strip_editor_keywords(copy.deepcopy(definition["properties"][name]))
+    raise KeyError(f"{name} is not a devcontainer.json property")
+
+
+@lru_cache(maxsize=None)
+def declared_properties():
+    """Top-level devcontainer.json properties, from the definitions the schema's root combines."""
+    schema = load_schema()
+    names, seen = set(), set()
+
+    def collect(subschema):
+        names.update(subschema.get("properties", {}))
+        ref = subschema.get("$ref", "")
+        if ref.startswith("#/definitions/") and ref not in seen:
+            seen.add(ref)
+            collect(schema["definitions"][ref.rsplit("/", 1)[1]])
+        for keyword in ("allOf", "oneOf", "anyOf"):
+            for branch in subschema.get(keyword, []):
+                collect(branch)
+
+    collect(schema)
+    return frozenset(names)
+
+
+def _strip_editor_keywords(schema):
+    for keyword in EDITOR_KEYWORDS & schema.keys():
+        del schema[keyword]
+    for keyword in ("properties", "patternProperties"):
+        if keyword in schema:
+            # Deprecated entries are left empty once their hints are removed
+            stripped = {key: _strip_editor_keywords(value) for key, value in schema[keyword].items()}
+            schema[keyword] = {key: value for key, value in stripped.items() if value}
+            if not schema[keyword]:
+                del schema[keyword]
+    for keyword in ("items", "additionalProperties"):
+        if isinstance(schema.get(keyword), dict):
+            _strip_editor_keywords(schema[keyword])
+    for keyword in ("oneOf", "anyOf", "allOf"):
+        for subschema in schema.get(keyword, []):
+            _strip_editor_keywords(subschema)
+    return schema
+
+
+def validate_devcontainer(devcontainer):
+    """Validate a devcontainer (model, dict or JSON string) and return a list of errors.
+
+    Each error is a dict with the JSON path of the offending value and a
+    message; an empty list means the document is valid.
+    """
+    if hasattr(devcontainer, "model_dump"):
+        devcontainer = devcontainer.model_dump(exclude_none=True)
+    elif isinstance(devcontainer, str):
+        try:
+            devcontainer = json.loads(devcontainer)
+        except json.JSONDecodeError as e:
+            return [{"path": "", "message": f"Invalid JSON: {e}"}]
+
+    errors, cascaded = [], []
+    for error in get_validator().iter_errors(devcontainer):
+        for leaf in _leaf_errors(error):
+            entry = {"path": "/".join(str(part) for part in leaf.absolute_path), "message": leaf.message}
+            if _is_root_unevaluated(leaf):
+                # When a branch of the root allOf/oneOf fails, the properties
+                # it declares count as unevaluated too, so one bad field also
+                # reports valid ones like name and image. Name only the keys
+                # the schema does not declare at the top level.
+                unexpected = sorted(key for key in leaf.instance if key not in declared_properties())
+                if not unexpected:
+                    cascaded.append(entry)
+                    continue
+                listed = ", ".join(repr(key) for key in unexpected)
+                verb = "was" if len(unexpected) == 1 else "were"
+                entry["message"] = f"Unevaluated properties are not allowed ({listed} {verb} unexpected)"
+            if entry not in errors:
+                errors.append(entry)
+    # A cascaded error is only redundant next to the errors that caused it;
+    # a rejected document always gets at least one error.
+    return errors or cascaded
+
+
+def _is_root_unevaluated(error):
+    return error.validator == "unevaluatedProperties" and not error.absolute_path and isinstance(error.instance, dict)
+
+
+def _leaf_errors(error):
+    # A failed oneOf/anyOf at the root only says "not valid under any of the
+    # given schemas"; the errors inside it that point at a specific field are
+    # the useful ones.
+    leaves = [
+        leaf for child in error.context for leaf in _leaf_errors(child)
+        if len(leaf.absolute_path) > len(error.absolute_path)
+    ]
+    return leaves or [error]
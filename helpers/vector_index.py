@@ -0,0 +1,212 @@
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from helpers.embedding_codec import decode_embedding
+from helpers.storage import get_storage
+
+LOAD_PAGE_SIZE = 1000
+
+
+class EmbeddingIndex:
+    """In-memory cosine-similarity index over stored repo-context embeddings.
+
+    Vectors are L2-normalised once on insert, so a search is a single matrix
+    product against the whole index followed by argpartition for the top k.
+    Storage grows by doubling, so adding rows does not copy the matrix each
+    time.
+    """
+
+    def __init__(self, dim=None):
+        self.dim = dim
+        self._vectors = None
+        self._size = 0
+        self._entries = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def add(self, entries, embeddings):
+        """Add entries (dicts with at least "url") and their embeddings."""
+        if len(embeddings) == 0:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional embeddings, got {vectors.shape[1]}")
+            needed = self._size + len(vectors)
+            if self._vectors is None or needed > len(self._vectors):
+                capacity = max(needed, 2 * (len(self._vectors) if self._vectors is not None else 0), 1024)
+                grown = np.empty((capacity, self.dim), dtype=np.float32)
+                if self._vectors is not None:
+                    grown[:self._size] = self._vectors[:self._size]
+                self._vectors = grown
+            self._vectors[self._size:needed] = vectors
+            self._entries.extend(entries)
+            self._size = needed
+
+    def save(self, path):
+        """Write the normalised vectors to path.npy and the entries to path.json."""
+        with self._lock:
+            size = self._size
+            vectors = self._vectors[:size] if size else np.empty((0, self.dim or 0), dtype=np.float32)
+            entries = self._entries[:size]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(f"{path}.npy.tmp", "wb") as f:
+            np.save(f, vectors, allow_pickle=False)
+        os.replace(f"{path}.npy.tmp", f"{path}.npy")
+        with open(f"{path}.json.tmp", "w") as f:
+            json.dump(entries, f)
+        os.replace(f"{path}.json.tmp", f"{path}.json")
+
+    @classmethod
+    def load(cls, path):
+        """Open a saved index, memory-mapping the vectors instead of reading them."""
+        vectors = np.load(f"{path}.npy", mmap_mode="r")
+        with open(f"{path}.json") as f:
+            entries = json.load(f)
+        index = cls(dim=vectors.shape[1])
+        # Saved vectors are already normalised; the memmap is only copied if
+        # rows are added and it has to grow.
+        index._vectors = vectors
+        index._entries = entries
+        index._size = len(entries)
+        return index
+
+    def search(self, queries, k=5):
+        """Return, for each query vector, up to k (similarity, entry) pairs, best first."""
+        queries = np.asarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        with self._lock:
+            size = self._size
+            if size == 0:
+                return [[] for _ in queries]
+            vectors = self._vectors[:size]
+            entries = self._entries[:size]
+
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+        scores = queries @ vectors.T
+
+        k = min(k, size)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        return [
+            [(float(score), entries[i]) for score, i in zip(row_scores, row_ids)]
+            for row_scores, row_ids in zip(top_scores, top)
+        ]
+
+
+def row_embedding(row):
+    # Rows written before the embedding_blob column carry JSON text instead
+    return decode_embedding(row.get("embedding_blob") or row.get("embedding"))
+
+
+def load_index(index=None):
+    """Add every stored row with an embedding (newer than those already in index)."""
+    start = time.perf_counter()
+    index = index if index is not None else EmbeddingIndex()
+    after_id = max((entry.get("id") or 0 for entry in index._entries), default=0)
+    loaded = skipped = 0
+    while True:
+        rows = get_storage().embedding_rows(after_id, LOAD_PAGE_SIZE)
+        entries, embeddings = [], []
+        for row in rows:
+            embedding = row_embedding(row)
+            if embedding is None or not len(embedding):
+                continue
+            # Rows embedded with a different model cannot be compared
+            index.dim = index.dim or len(embedding)
+            if len(embedding) != index.dim:
+                skipped += 1
+                continue
+            entries.append({key: row[key] for key in ("id", "url", "devcontainer_json")})
+            embeddings.append(embedding)
+        index.add(entries, embeddings)
+        loaded += len(entries)
+        if len(rows) < LOAD_PAGE_SIZE:
+            break
+        after_id = rows[-1]["id"]
+    logging.info(f"Loaded {loaded} embeddings into the vector index in {time.perf_counter() - start:.2f}s")
+    if skipped:
+        logging.warning(f"Skipped {skipped} embeddings whose dimension differs from the index ({index.dim})")
+    return index, loaded
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Return the shared index, loading it on first use.
+
+    With VECTOR_INDEX_PATH set, the index is opened from that snapshot
+    (memory-mapped), topped up with rows inserted since, and re-saved.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            path = os.getenv("VECTOR_INDEX_PATH")
+            index = None
+            if path and os.path.exists(f"{path}.npy"):
+                index = EmbeddingIndex.load(path)
+                logging.info(f"Opened vector index snapshot with {len(index)} rows from {path}")
+            index, loaded = load_index(index)
+            if path and loaded:
+                index.save(path)
+            _index = index
+    return _index
+
+
+def index_rows(rows):
+    """Add freshly inserted rows to the index, if it has been loaded."""
+    if _index is None:
+        return
+    rows = [row for row in rows if row.get("embedding_blob") or row.get("embedding")]
+    _index.add(
+        [{key: row.get(key) for key in ("id", "url", "devcontainer_json")} for row in rows],
+        [row_embedding(row) for row in rows],
+    )
+
+
+def find_similar(embedding, exclude_url=None, k=None):
+    """Nearest stored repos to embedding as (similarity, entry), best first."""
+    k = k or int(os.getenv("SEMANTIC_TOP_K", 5))
+    # Over-fetch so earlier rows for the same repository can be dropped
+    matches = get_index().search(embedding, 2 * k)[0]
+    return [(score, entry) for score, entry in matches if entry["url"] != exclude_url][:k]
+
+
+def match_similar(embedding, exclude_url=None):
+    """Decide how to use the closest stored repo.
+
+    Returns ("reuse", similarity, entry) when it is close enough to serve its
+    devcontainer.json as is, ("seed", similarity, entry) when it is close
+    enough to hand to the LLM as a reference, and (None, similarity, None)
+    otherwise.
+    """
+    matches = find_similar(embedding, exclude_url, k=1)
+    if not matches:
+        return None, 0.0, None
+    similarity, entry = matches[0]
+    if similarity >= float(os.getenv("SEMANTIC_REUSE_THRESHOLD", 0.98)):
+        return "reuse", similarity, entry
+    if similarity >= float(os.getenv("SEMANTIC_SEED_THRESHOLD", 0.92)):
+        return "seed", similarity, entry
+    return None, similarity, None
@@ -1,24 +1,40 @@
+import asyncio
 import logging
 import os
 import json
 from datetime import datetime
+from html import escape
+from urllib.parse import urlencode
 from fasthtml.common import *
 from dotenv import load_dotenv
-from supabase_client import supabase
+from starlette.responses import Response, StreamingResponse
 
-from helpers.openai_helpers import setup_azure_openai, setup_instructor
-from helpers.github_helpers import fetch_repo_context, check_url_exists
+# Load environment variables before the helpers are imported; several of
+# them read their settings at import time.
+load_dotenv()
+
+from helpers.openai_helpers import setup_async_azure_openai, setup_instructor
+from helpers.executor import run_blocking
+from helpers.metrics import finish_trace, render_metrics, span, start_trace
+from helpers.github_helpers import (
+    check_url_exists, fetch_repo_context, fetch_stored_context, normalize_repo_url, resolve_head_sha,
+)
 from helpers.devcontainer_helpers import generate_devcontainer_json, validate_devcontainer_json
-from helpers.token_helpers import count_tokens, truncate_to_token_limit
+from helpers.context_helpers import RepoContext
+from helpers.embedding_codec import encode_embedding, to_postgrest
+from helpers.persistence import PersistenceQueue
+from helpers.result_cache import result_cache
+from helpers.singleflight import SingleFlight
+from helpers.storage import RECORD_COLUMNS, get_storage
+from helpers.token_helpers import truncate_to_token_limit
+from helpers.validation import get_validator
+from helpers.vector_index import index_rows, match_similar
 from models import DevContainer
 from schemas import DevContainerModel
 from content import *
 
 # Set up logging
-logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
-
-# Load environment variables
-load_dotenv()
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="%(asctime)s - %(levelname)s - %(message)s")
 
 def check_env_vars():
     required_vars = [
@@ -27,9 +43,9 @@ def check_env_vars():
         "AZURE_OPENAI_API_VERSION",
         "MODEL",
         "GITHUB_TOKEN",
-        "SUPABASE_URL",
-        "SUPABASE_KEY",
     ]
+    if os.getenv("STORAGE_BACKEND", "supabase").lower() == "supabase":
+        required_vars += ["SUPABASE_URL", "SUPABASE_KEY"]
     missing_vars = [var for var in required_vars if not os.environ.get(var)]
     if missing_vars:
         print(f"Missing environment variables: {', '.join(missing_vars)}. Please configure the env vars file properly.")
@@ -63,13 +79,19 @@ hdrs = [
         image=f'/assets/og-sq.png',
         url=''),
     Script(src='https://cdn.jsdelivr.net/gh/gnat/surreal@main/surreal.js'),
+    Script(src="https://unpkg.com/htmx-ext-sse/sse.js"),
     scopesrc,
     Link(rel="stylesheet", href="/css/main.css"),
 ]
 
+async def drain_persistence_queue():
+    # Let queued embeddings and inserts finish before the server exits
+    await persistence_queue.drain()
+
 # Initialize FastHTML app
 app, rt = fast_app(
     hdrs=hdrs,
+    on_shutdown=[drain_persistence_queue],
     live=True,
     debug=True
 )
@@ -101,100 +123,271 @@ def home():
 async def get():
     return home()
 
-@rt("/generate", methods=["post"])
-async def post(repo_url: str, regenerate: bool = False):
-    logging.info(f"Generating devcontainer.json for: {repo_url}")
-
-    # Normalize the repo_url by stripping trailing slashes
-    repo_url = repo_url.rstrip('/')
+async def run_generation(repo_url, regenerate=False, progress=None, trace_id=None):
+    """Run the generation pipeline and return (devcontainer_json, source).
 
+    progress, if given, is an async callable receiving (event, data) for each
+    stage and for every partial devcontainer.json streamed from the LLM.
+    Stage timings are recorded under trace_id (a new id if not given) and
+    logged as one line when the pipeline finishes.
+    """
+    start_trace(trace_id)
+    source = "error"
     try:
-        exists, existing_record = check_url_exists(repo_url)
-        logging.info(f"URL check result: exists={exists}, existing_record={existing_record}")
+        with span("generation"):
+            devcontainer_json, source = await _run_generation(repo_url, regenerate, progress)
+    finally:
+        # Failed generations are recorded too, under source="error"
+        finish_trace(source)
+    return devcontainer_json, source
+
+async def _run_generation(repo_url, regenerate, progress):
+    async def report(event, data):
+        if progress is not None:
+            await progress(event, data)
+
+    async def on_partial(partial_json):
+        await report("token", partial_json)
+
+    await report("stage", "Checking for an existing devcontainer.json...")
+    if regenerate:
+        # With REDIS_URL set these are network round-trips; keep them off the loop
+        await run_blocking(result_cache.invalidate, repo_url)
+    with span("url_check"):
+        exists, existing_record = await run_blocking(check_url_exists, repo_url, use_cache=not regenerate)
+    logging.info(f"URL check result: exists={exists}")
 
-        repo_context, existing_devcontainer, devcontainer_url = fetch_repo_context(repo_url)
-        logging.info(f"Fetched repo context. Existing devcontainer: {'Yes' if existing_devcontainer else 'No'}")
+    commit_sha = None
+    embedding = None
+    generation = {}
+    if exists and not regenerate:
+        logging.info(f"URL already exists in database. Returning existing devcontainer_json for: {repo_url}")
+        devcontainer_json = existing_record['devcontainer_json']
+        generated = existing_record['generated']
+        source = "database"
+        url = existing_record['devcontainer_url']
+    else:
+        await report("stage", "Fetching repository context from GitHub...")
+        commit_sha = await resolve_head_sha(repo_url)
+        stored_context = None
+        if exists and commit_sha and existing_record.get('commit_sha') == commit_sha:
+            stored_context = await run_blocking(fetch_stored_context, repo_url, commit_sha)
+        if stored_context:
+            logging.info(f"Repository unchanged since commit {commit_sha}. Reusing stored context.")
+            repo_context = await run_blocking(RepoContext.from_text, stored_context)
+            devcontainer_url = existing_record['devcontainer_url']
+        else:
+            with span("github_fetch"):
+                repo_context, existing_devcontainer, devcontainer_url = await fetch_repo_context(repo_url, ref=commit_sha or "HEAD")
+            logging.info(f"Fetched repo context. Existing devcontainer: {'Yes' if existing_devcontainer else 'No'}")
         logging.info(f"Devcontainer URL: {devcontainer_url}")
 
-        if exists and not regenerate:
-            logging.info(f"URL already exists in database. Returning existing devcontainer_json for: {repo_url}")
-            devcontainer_json = existing_record['devcontainer_json']
-            generated = existing_record['generated']
-            source = "database"
-            url = existing_record['devcontainer_url']
+        # Near-duplicates of stored repos (forks, templates) can reuse or seed
+        # from an earlier result. The embedding is kept for the insert.
+        action, similar = None, None
+        if os.getenv("SEMANTIC_REUSE", "false").lower() == "true" and not regenerate and devcontainer_url is None:
+            await report("stage", "Looking for similar repositories...")
+            try:
+                embedding = (await embed_texts([repo_context.text]))[0]
+                action, similarity, similar = await run_blocking(match_similar, embedding, repo_url)
+                logging.info(f"Closest stored repository similarity: {similarity:.4f} ({action or 'no match'})")
+            except Exception as e:
+                logging.warning(f"Similar repository lookup failed, generating from scratch: {e}")
+
+        if action == "reuse":
+            devcontainer_json = similar["devcontainer_json"]
+            generated = False
+            source = "similar repository"
         else:
-            devcontainer_json, url = generate_devcontainer_json(instructor_client, repo_url, repo_context, devcontainer_url, regenerate=regenerate)
+            await report("stage", "Generating devcontainer.json...")
+            devcontainer_json, url = await generate_devcontainer_json(
+                instructor_client, repo_url, repo_context, devcontainer_url,
+                regenerate=regenerate,
+                on_partial=on_partial if progress is not None else None,
+                similar_devcontainer=similar,
+                report=generation,
+            )
             generated = True
             source = "generated" if url is None else "repository"
 
+    if not exists or regenerate:
+        # Embedding and the insert happen on the persistence worker, after
+        # the response has been returned.
+        new_devcontainer = DevContainer(
+            url=repo_url,
+            devcontainer_json=devcontainer_json,
+            devcontainer_url=devcontainer_url,
+            repo_context=repo_context.text,
+            tokens=repo_context.tokens,
+            model=generation.get("model", os.getenv("MODEL")),
+            embedding=None,
+            generated=generated,
+            commit_sha=commit_sha,
+            generation_ms=generation.get("generation_ms"),
+            created_at=datetime.utcnow().isoformat()  # Ensure this is a string
+        )
 
-        if not exists or regenerate:
-            logging.info("Saving to database...")
-            try:
-                if hasattr(openai_client.embeddings, "create"):
-                    embedding_model = os.getenv("EMBEDDING", "text-embedding-ada-002")
-                    max_tokens = int(os.getenv("EMBEDDING_MODEL_MAX_TOKENS", 8192))
-
-                    truncated_context = truncate_to_token_limit(repo_context, embedding_model, max_tokens)
-
-                    embedding = openai_client.embeddings.create(input=truncated_context, model=embedding_model).data[0].embedding
-                    embedding_json = json.dumps(embedding)
-                else:
-                    embedding_json = None
-
-                new_devcontainer = DevContainer(
-                    url=repo_url,
-                    devcontainer_json=devcontainer_json,
-                    devcontainer_url=devcontainer_url,
-                    repo_context=repo_context,
-                    tokens=count_tokens(repo_context),
-                    model=os.getenv("MODEL"),
-                    embedding=embedding_json,
-                    generated=generated,
-                    created_at=datetime.utcnow().isoformat()  # Ensure this is a string
-                )
-
-                # Convert the Pydantic model to a dictionary and handle datetime serialization
-                devcontainer_dict = json.loads(new_devcontainer.json(exclude_unset=True))
-
-                result = supabase.table("devcontainers").insert(devcontainer_dict).execute()
-                logging.info(f"Successfully saved to database with devcontainer_url: {devcontainer_url}")
-            except Exception as e:
-                logging.error(f"Error while saving to database: {str(e)}")
-                raise
+        # Convert the Pydantic model to a dictionary and handle datetime serialization
+        devcontainer_dict = json.loads(new_devcontainer.json(exclude_unset=True))
+        embedding_input = None
+        if embedding is not None:
+            devcontainer_dict["embedding_blob"] = to_postgrest(encode_embedding(embedding))
+        elif hasattr(openai_client.embeddings, "create"):
+            embedding_input = repo_context.text
+        await persistence_queue.put(devcontainer_dict, embedding_input)
+        logging.info(f"Queued database save with devcontainer_url: {devcontainer_url}")
+        # Serve the new result from the cache while the insert is pending
+        await run_blocking(result_cache.set, repo_url, {key: devcontainer_dict.get(key) for key in RECORD_COLUMNS})
+
+    return devcontainer_json, source
+
+generation_flights = SingleFlight()
+
+async def generate_once(repo_url, regenerate=False, progress=None, trace_id=None):
+    """run_generation, shared by every concurrent request for the same repository."""
+    key = (normalize_repo_url(repo_url), regenerate)
+    # Without a listener the LLM call is not streamed, so its response
+    # carries token usage (including cached prompt tokens) for the metrics.
+    return await generation_flights.do(
+        key,
+        lambda broadcast: run_generation(repo_url, regenerate, broadcast if progress is not None else None, trace_id),
+        progress,
+    )
+
+async def embed_texts(texts):
+    embedding_model = os.getenv("EMBEDDING", "text-embedding-ada-002")
+    max_tokens = int(os.getenv("EMBEDDING_MODEL_MAX_TOKENS", 8192))
+    inputs = await run_blocking(
+        lambda: [truncate_to_token_limit(text, embedding_model, max_tokens) for text in texts]
+    )
+    with span("embedding"):
+        response = await openai_client.embeddings.create(input=inputs, model=embedding_model)
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+async def embed_contexts(texts):
+    return [to_postgrest(encode_embedding(embedding)) for embedding in await embed_texts(texts)]
+
+def insert_devcontainers(rows):
+    with span("insert"):
+        inserted = get_storage().insert_devcontainers(rows)
+    try:
+        index_rows(inserted)
+    except Exception as e:
+        # The rows are saved; failing here would make the queue insert them again
+        logging.warning(f"Could not add {len(inserted)} rows to the vector index: {e}")
+
+persistence_queue = PersistenceQueue(embed_contexts, insert_devcontainers, embedding_field="embedding_blob")
+
+def render_result(repo_url, devcontainer_json, source):
+    return Div(
+        Article(f"Devcontainer.json {'found in ' + source if source in ['database', 'repository', 'similar repository'] else 'generated'}"),
+        Pre(
+            Code(devcontainer_json, id="devcontainer-code", cls="overflow-auto"),
+            Div(
+                Button(
+                    Img(cls="w-4 h-4", src="assets/icons/copy-icon.svg", alt="Copy"),
+                    cls="icon-button copy-button",
+                    title="Copy to clipboard",
+                ),
+                Button(
+                    Img(cls="w-4 h-4", src="assets/icons/regenerate.svg", alt="Regenerate"),
+                    cls="icon-button regenerate-button",
+                    hx_post=f"/generate?regenerate=true&repo_url={repo_url}",
+                    hx_target="#result",
+                    hx_indicator="#action-text",
+                    title="Regenerate",
+                ),
+                Span(cls="action-text", id="action-text"),
+                cls="button-group"
+            ),
+            cls="code-container relative"
+        )
+    )
+
+def render_error(e):
+    return Div(H2("Error"), P(f"An error occurred: {str(e)}"))
+
+def sse_event(event, data):
+    # Multi-line payloads need one "data:" line per line of content
+    lines = "\n".join(f"data: {line}" for line in str(data).splitlines() or [""])
+    return f"event: {event}\n{lines}\n\n"
+
+@rt("/generate", methods=["post"])
+async def post(request: Request, repo_url: str, regenerate: bool = False):
+    logging.info(f"Generating devcontainer.json for: {repo_url}")
+
+    # Normalize the repo_url by stripping trailing slashes
+    repo_url = repo_url.rstrip('/')
 
+    if os.getenv("STREAM_GENERATION", "true").lower() == "true":
+        # Return a shell immediately; the pipeline runs behind /generate/stream
+        # and swaps progress, partial JSON and finally the result into it.
+        query = urlencode({"repo_url": repo_url, "regenerate": str(regenerate).lower()})
         return Div(
-            Article(f"Devcontainer.json {'found in ' + source if source in ['database', 'repository'] else 'generated'}"),
+            # hx-swap is inherited, so children must not pick up the outer
+            # element's outerHTML: that would replace them, and their SSE
+            # listeners, on the first event. Each token is the whole partial
+            # JSON so far, so it replaces the previous one.
+            Article("Starting...", sse_swap="stage", hx_swap="innerHTML"),
             Pre(
-                Code(devcontainer_json, id="devcontainer-code", cls="overflow-auto"),
-                Div(
-                    Button(
-                        Img(cls="w-4 h-4", src="assets/icons/copy-icon.svg", alt="Copy"),
-                        cls="icon-button copy-button",
-                        title="Copy to clipboard",
-                    ),
-                    Button(
-                        Img(cls="w-4 h-4", src="assets/icons/regenerate.svg", alt="Regenerate"),
-                        cls="icon-button regenerate-button",
-                        hx_post=f"/generate?regenerate=true&repo_url={repo_url}",
-                        hx_target="#result",
-                        hx_indicator="#action-text",
-                        title="Regenerate",
-                    ),
-                    Span(cls="action-text", id="action-text"),
-                    cls="button-group"
-                ),
-                cls="code-container relative"
-            )
+                Code("", id="devcontainer-code", cls="overflow-auto", sse_swap="token", hx_swap="innerHTML"),
+                cls="code-container relative",
+            ),
+            hx_ext="sse",
+            sse_connect=f"/generate/stream?{query}",
+            sse_swap="done",
+            hx_swap="outerHTML",
         )
+
+    try:
+        devcontainer_json, source = await generate_once(
+            repo_url, regenerate, trace_id=request.headers.get("x-trace-id")
+        )
+        return render_result(repo_url, devcontainer_json, source)
     except Exception as e:
         logging.error(f"An error occurred: {str(e)}", exc_info=True)
-        return Div(H2("Error"), P(f"An error occurred: {str(e)}"))
+        return render_error(e)
+
+@rt("/generate/stream")
+async def get(request: Request, repo_url: str, regenerate: bool = False):
+    trace_id = request.headers.get("x-trace-id")
+    queue = asyncio.Queue()
+
+    async def progress(event, data):
+        if event == "token":
+            data = escape(data)
+        await queue.put(sse_event(event, data))
+
+    async def run():
+        try:
+            devcontainer_json, source = await generate_once(repo_url, regenerate, progress, trace_id)
+            html = to_xml(render_result(repo_url, devcontainer_json, source))
+        except Exception as e:
+            logging.error(f"An error occurred: {str(e)}", exc_info=True)
+            html = to_xml(render_error(e))
+        await queue.put(sse_event("done", html))
+        await queue.put(None)
+
+    async def events():
+        task = asyncio.create_task(run())
+        try:
+            while (message := await queue.get()) is not None:
+                yield message
+        finally:
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 @rt("/manifesto")
 async def get():
     return manifesto_page()
 
+@rt("/metrics")
+async def get():
+    # Prometheus text exposition format
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # Serve static files
 @rt("/{fname:path}.{ext:static}")
 async def get(fname:str, ext:str):
@@ -202,9 +395,13 @@ async def get(fname:str, ext:str):
 
 # Initialize clients
 if check_env_vars():
-    openai_client = setup_azure_openai()
+    # Async clients keep LLM and embedding calls from blocking the event loop
+    openai_client = setup_async_azure_openai()
     instructor_client = setup_instructor(openai_client)
 
+# Compile the devcontainer.json schema once, before the first request needs it
+get_validator()
+
 if __name__ == "__main__":
     logging.info("Starting FastHTML app...")
     serve()
\ No newline at end of file
@@ -1,5 +1,6 @@
 import psycopg2
 from dotenv import load_dotenv
+import importlib.util
 import os
 import sys
 import logging
@@ -11,62 +12,90 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # Load environment variables from .env
 load_dotenv()
 
-# Fetch the SUPABASE_DB_URL from environment variables
-DATABASE_URL = os.getenv("SUPABASE_DB_URL")
-
-
-# Debugging: Ensure DATABASE_URL is loaded (avoid printing sensitive information)
-if DATABASE_URL:
-    logging.info("SUPABASE_DB_URL loaded successfully.")
-else:
-    logging.error("SUPABASE_DB_URL is not set. Please check your .env file.")
-    sys.exit(1)  # Exit the script with a non-zero status
-
-# Define the migration SQL
-CREATE_TABLE_SQL = """
-CREATE TABLE IF NOT EXISTS devcontainers (
-  id INTEGER NOT NULL,
-  url VARCHAR,
-  devcontainer_json TEXT,
-  devcontainer_url VARCHAR,
-  repo_context TEXT,
-  tokens INTEGER,
-  model TEXT,
-  embedding TEXT,
-  generated BOOLEAN,
-  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-  PRIMARY KEY (id)
+# Numbered migrations, applied in order: NNN_name.sql runs as is, NNN_name.py
+# must define migrate(cursor). Each runs in its own transaction and is
+# recorded in schema_migrations so it is applied only once.
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+CREATE_MIGRATIONS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+  version VARCHAR PRIMARY KEY,
+  applied_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 """
 
+def list_migrations():
+    return sorted(
+        name for name in os.listdir(MIGRATIONS_DIR)
+        if name[:3].isdigit() and name.endswith((".sql", ".py"))
+    )
+
+def run_migration(cursor, name):
+    path = os.path.join(MIGRATIONS_DIR, name)
+    if name.endswith(".sql"):
+        with open(path) as f:
+            cursor.execute(f.read())
+    else:
+        spec = importlib.util.spec_from_file_location(f"migrations.{name[:-3]}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.migrate(cursor)
+
+def apply_migrations(connection, until=None):
+    """Apply pending migrations up to and including version until; return their names."""
+    with connection, connection.cursor() as cursor:
+        cursor.execute(CREATE_MIGRATIONS_TABLE_SQL)
+        cursor.execute("SELECT version FROM schema_migrations")
+        applied = {row[0] for row in cursor.fetchall()}
+
+    newly_applied = []
+    for name in list_migrations():
+        version = name.split(".")[0]
+        if until is not None and version[:3] > until:
+            break
+        if version in applied:
+            continue
+        logging.info(f"Applying migration {name}...")
+        with connection, connection.cursor() as cursor:
+            run_migration(cursor, name)
+            cursor.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (version,))
+        newly_applied.append(name)
+    return newly_applied
+
 def main():
+    # Fetch the SUPABASE_DB_URL from environment variables
+    database_url = os.getenv("SUPABASE_DB_URL")
+
+    # Debugging: Ensure the database URL is loaded (avoid printing sensitive information)
+    if database_url:
+        logging.info("SUPABASE_DB_URL loaded successfully.")
+    else:
+        logging.error("SUPABASE_DB_URL is not set. Please check your .env file.")
+        sys.exit(1)  # Exit the script with a non-zero status
+
     connection = None  # Initialize connection variable
 
     try:
         # Connect to the PostgreSQL database using the connection string
-        connection = psycopg2.connect(DATABASE_URL)
-        connection.autocommit = True  # Enable autocommit mode
+        connection = psycopg2.connect(database_url)
         logging.info("Connection to the database was successful.")
 
-        # Create a cursor to execute SQL queries
-        cursor = connection.cursor()
-
-        # Execute the CREATE TABLE statement
-        cursor.execute(CREATE_TABLE_SQL)
-        logging.info("devcontainers table created (if it didn't exist already).")
+        newly_applied = apply_migrations(connection)
+        if newly_applied:
+            logging.info(f"Applied {len(newly_applied)} migrations: {', '.join(newly_applied)}")
+        else:
+            logging.info("Database schema is up to date.")
 
         # Optionally, verify the table creation
-        cursor.execute("""
-            SELECT table_name 
-            FROM information_schema.tables 
-            WHERE table_schema = 'public' AND table_type = 'BASE TABLE';
-        """)
-        tables = cursor.fetchall()
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT table_name
+                FROM information_schema.tables
+                WHERE table_schema = 'public' AND table_type = 'BASE TABLE';
+            """)
+            tables = cursor.fetchall()
         logging.info(f"Current tables in 'public' schema: {tables}")
 
-        # Close the cursor
-        cursor.close()
-
     except psycopg2.OperationalError as e:
         logging.error("OperationalError: Could not connect to the database.")
         logging.error("Please check your SUPABASE_DB_URL and ensure the database server is running.")
@@ -0,0 +1,13 @@
+CREATE TABLE IF NOT EXISTS devcontainers (
+  id INTEGER NOT NULL,
+  url VARCHAR,
+  devcontainer_json TEXT,
+  devcontainer_url VARCHAR,
+  repo_context TEXT,
+  tokens INTEGER,
+  model TEXT,
+  embedding TEXT,
+  generated BOOLEAN,
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  PRIMARY KEY (id)
+);
@@ -0,0 +1 @@
+ALTER TABLE devcontainers ADD COLUMN IF NOT EXISTS commit_sha VARCHAR;
@@ -0,0 +1 @@
+ALTER TABLE devcontainers ADD COLUMN IF NOT EXISTS embedding_blob BYTEA;
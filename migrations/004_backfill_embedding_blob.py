@@ -0,0 +1,24 @@
+import json
+
+import psycopg2
+
+from helpers.embedding_codec import encode_embedding
+
+BATCH_SIZE = 500
+
+
+def migrate(cursor):
+    """Convert JSON text embeddings to embedding_blob and clear the text column."""
+    while True:
+        cursor.execute(
+            "SELECT id, embedding FROM devcontainers "
+            "WHERE embedding IS NOT NULL AND embedding_blob IS NULL LIMIT %s",
+            (BATCH_SIZE,),
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        cursor.executemany(
+            "UPDATE devcontainers SET embedding_blob = %s, embedding = NULL WHERE id = %s",
+            [(psycopg2.Binary(encode_embedding(json.loads(embedding))), row_id) for row_id, embedding in rows],
+        )
@@ -0,0 +1,2 @@
+-- check_url_exists filters on url and takes the newest row
+CREATE INDEX IF NOT EXISTS ix_devcontainers_url_created_at ON devcontainers (url, created_at DESC);
@@ -0,0 +1,35 @@
+-- Repo contexts are stored once per distinct content, keyed by the SHA-256
+-- of their UTF-8 text (helpers.context_helpers.context_hash).
+CREATE TABLE IF NOT EXISTS repo_contexts (
+  hash CHAR(64) PRIMARY KEY,
+  content TEXT NOT NULL,
+  tokens INTEGER,
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+ALTER TABLE devcontainers ADD COLUMN IF NOT EXISTS context_hash CHAR(64) REFERENCES repo_contexts (hash);
+
+-- lz4 TOAST compression for the large text columns (PostgreSQL 14+ built
+-- with lz4; other servers keep the default pglz)
+DO $$
+BEGIN
+  IF current_setting('server_version_num')::int >= 140000 THEN
+    ALTER TABLE repo_contexts ALTER COLUMN content SET COMPRESSION lz4;
+    ALTER TABLE devcontainers ALTER COLUMN devcontainer_json SET COMPRESSION lz4;
+  END IF;
+EXCEPTION WHEN feature_not_supported THEN
+  RAISE NOTICE 'lz4 compression is not available, keeping the default';
+END $$;
+
+INSERT INTO repo_contexts (hash, content, tokens)
+SELECT DISTINCT ON (hash) hash, repo_context, tokens
+FROM (
+  SELECT encode(sha256(convert_to(repo_context, 'UTF8')), 'hex') AS hash, repo_context, tokens
+  FROM devcontainers
+  WHERE repo_context IS NOT NULL
+) AS contexts
+ON CONFLICT (hash) DO NOTHING;
+
+UPDATE devcontainers
+SET context_hash = encode(sha256(convert_to(repo_context, 'UTF8')), 'hex'), repo_context = NULL
+WHERE repo_context IS NOT NULL;
@@ -0,0 +1,2 @@
+-- Wall time of the LLM calls behind a generated row; with model, used to tune SMALL_MODEL routing
+ALTER TABLE devcontainers ADD COLUMN IF NOT EXISTS generation_ms INTEGER;
@@ -7,9 +7,13 @@ class DevContainer(BaseModel):
     url: str
     devcontainer_json: str
     devcontainer_url: Optional[str]
-    repo_context: str
+    repo_context: str  # moved to repo_contexts on insert, see context_hash
+    context_hash: Optional[str] = None
     tokens: int
-    model: str
-    embedding: Optional[str]
+    model: str  # the deployment that produced the result, see choose_model
+    embedding: Optional[str]  # legacy JSON text, superseded by embedding_blob
+    embedding_blob: Optional[str] = None  # see helpers/embedding_codec.py
     generated: bool
+    commit_sha: Optional[str] = None
+    generation_ms: Optional[int] = None  # LLM wall time, including repairs
     created_at: str = datetime.utcnow().isoformat()
\ No newline at end of file
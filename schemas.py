@@ -1,19 +1,43 @@
 # schemas.py
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Any, Optional, Union
+
+from helpers.validation import schema_property
+
+# Lifecycle commands: a shell string, an argv list, or named parallel commands
+Command = Union[str, list[str], dict[str, Union[str, list[str]]]]
+
+
+def schema_field(name, default=...):
+    """A Field whose JSON schema is the devcontainer.json schema's definition of name.
+
+    The JSON schema is what the LLM sees in the tool definition, so it is asked
+    for exactly the shapes (port ranges, patterns, command forms) that
+    validation accepts, instead of a looser hand-written approximation.
+    """
+    fragment = schema_property(name)
+
+    def use_schema_fragment(schema):
+        # Keep pydantic's default: instructor marks every property without
+        # one as required.
+        kept = {key: schema[key] for key in ("default",) if key in schema}
+        schema.clear()
+        schema.update(fragment, **kept)
+
+    return Field(default, json_schema_extra=use_schema_fragment)
+
 
 class DevContainerModel(BaseModel):
-    name: str = Field(description="Name of the dev container")
-    image: str = Field(description="Docker image to use")
-    forwardPorts: Optional[list[int]] = Field(
-        description="Ports to forward from the container to the local machine"
-    )
-    customizations: Optional[dict] = Field(
-        None, description="Tool-specific configuration"
-    )
-    settings: Optional[dict] = Field(
-        None, description="VS Code settings to configure the development environment"
-    )
-    postCreateCommand: Optional[str] = Field(
-        description="Command to run after creating the container"
-    )
\ No newline at end of file
+    name: str = schema_field("name")
+    image: str = schema_field("image")
+    features: Optional[dict[str, Any]] = schema_field("features", None)
+    forwardPorts: Optional[list[Union[int, str]]] = schema_field("forwardPorts", None)
+    portsAttributes: Optional[dict[str, dict[str, Any]]] = schema_field("portsAttributes", None)
+    containerEnv: Optional[dict[str, str]] = schema_field("containerEnv", None)
+    remoteUser: Optional[str] = schema_field("remoteUser", None)
+    # VS Code settings and extensions belong here, under "vscode"; the schema
+    # has no top-level "settings" property.
+    customizations: Optional[dict[str, Any]] = schema_field("customizations", None)
+    postCreateCommand: Optional[Command] = schema_field("postCreateCommand", None)
+    postStartCommand: Optional[Command] = schema_field("postStartCommand", None)
+    postAttachCommand: Optional[Command] = schema_field("postAttachCommand", None)
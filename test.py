@@ -1,8 +1,10 @@
 import os
-import requests
+import asyncio
+import httpx
 from dotenv import load_dotenv
+from helpers.github_client import github_get, get_pool_stats, close_client
 
-def main():
+async def main():
     # Unset any existing GITHUB_TOKEN environment variable
     if 'GITHUB_TOKEN' in os.environ:
         del os.environ['GITHUB_TOKEN']
@@ -32,7 +34,7 @@ def main():
     print(f"Headers: {headers}")
     print(f"Contents API URL: {contents_api_url}")
 
-    response = requests.get(contents_api_url, headers=headers)
+    response = await github_get(contents_api_url, headers=headers)
     print(f"Response (standard): {response.status_code} - {response.text}")
 
     http_proxy = os.getenv('HTTP_PROXY', '')
@@ -40,9 +42,15 @@ def main():
     print(f"HTTP_PROXY: {http_proxy}")
     print(f"HTTPS_PROXY: {https_proxy}")
 
-    # Try turning off SSL verify just to debug if it's causing issues
-    response_no_ssl = requests.get(contents_api_url, headers=headers, verify=False)
+    # Try turning off SSL verify just to debug if it's causing issues. This
+    # deliberately bypasses the shared (verifying) connection pool.
+    response_no_ssl = httpx.get(contents_api_url, headers=headers, verify=False)
     print(f"Response (no SSL verify): {response_no_ssl.status_code} - {response_no_ssl.text}")
 
+    # A second request should reuse the pooled connection
+    await github_get(contents_api_url, headers=headers)
+    print(f"Pool stats: {get_pool_stats()}")
+    await close_client()
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
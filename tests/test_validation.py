@@ -0,0 +1,28 @@
+import pytest
+
+from helpers.validation import get_validator, validate_devcontainer
+
+
+@pytest.mark.parametrize("key", ["target", "type", "source", "args", "options", "cacheFrom", "service", "runServices"])
+def test_stray_key_named_like_a_nested_property_is_reported(key):
+    # Mount, buildOptions and the compose container declare these names, but
+    # not as top-level properties of an image-based devcontainer.json.
+    devcontainer = {"name": "x", "image": "y", key: 1}
+    assert not get_validator().is_valid(devcontainer)
+    errors = validate_devcontainer(devcontainer)
+    assert errors
+    assert errors[0]["path"] == ""
+
+
+def test_name_image_target_is_rejected():
+    errors = validate_devcontainer({"name": "x", "image": "y", "target": 1})
+    assert errors == [{"path": "", "message": "Unevaluated properties are not allowed ('target' was unexpected)"}]
+
+
+def test_field_error_does_not_report_valid_keys_as_unexpected():
+    errors = validate_devcontainer({"name": "x", "image": "y", "forwardPorts": [70000]})
+    assert [error["path"] for error in errors] == ["forwardPorts/0"]
+
+
+def test_valid_document_has_no_errors():
+    assert validate_devcontainer({"name": "x", "image": "y", "forwardPorts": [8000, "db:5432"]}) == []